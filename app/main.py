@@ -1,8 +1,15 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
-from src.nornir_tasks.deploy_config import send_config_one_router
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from src.nornir_tasks.deploy_config import nr, send_config_one_router, send_config_routers, rollback_one_router
+from src.nornir_tasks.state_store import state_store, state_subscriber
+from src.nornir_tasks.processors import StreamingResultProcessor, follow
 from dotenv import load_dotenv
 import pynetbox
+import threading
+import queue
+import json
 import os
 
 load_dotenv(".env")
@@ -11,7 +18,23 @@ NETBOX_URL = os.getenv("NETBOX_URL")
 NETBOX_TOKEN = os.getenv("NETBOX_TOKEN")
 nb = pynetbox.api(NETBOX_URL, token=NETBOX_TOKEN)
 
-app = FastAPI(title="Nornir API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  # Keep live operational state of every router in memory
+  state_subscriber.start(nr.inventory.hosts.values())
+  yield
+  state_subscriber.stop()
+
+app = FastAPI(title="Nornir API", lifespan=lifespan)
+
+
+class ApplyRequest(BaseModel):
+  # Host names to push to
+  hosts: list[str] | None = None
+  # Nornir inventory filter, e.g. {"platform": "srlinux"}; combined with `hosts` if both are given
+  filter: dict | None = None
+
 
 @app.get("/")
 async def get_routers():
@@ -25,8 +48,78 @@ async def get_routers():
     }
   return JSONResponse(content={"devices": info_dict})
 
+@app.get("/state/{host}")
+async def get_state(host: str, table: str | None = None):
+  if host not in nr.inventory.hosts:
+    raise HTTPException(status_code=404, detail=f"Unknown host {host}")
+  state = state_store.snapshot(host)
+  if table is not None:
+    state = state.get(table, {})
+  return JSONResponse(content={"host": host, "last_update": state_store.last_update(host), "state": state})
+
+@app.get("/results/stream")
+async def stream_results(request: Request, from_start: bool = False):
+  async def events():
+    async for record in follow(from_start=from_start):
+      if await request.is_disconnected():
+        break
+      if record is None:
+        # SSE comment keeping idle connections (and proxies) alive
+        yield ": keep-alive\n\n"
+      else:
+        yield f"data: {json.dumps(record)}\n\n"
+  return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/apply-config")
+async def apply_config_bulk(request: ApplyRequest):
+  if not request.hosts and not request.filter:
+    raise HTTPException(status_code=400, detail="Provide hosts and/or filter")
+  unknown = [h for h in request.hosts or [] if h not in nr.inventory.hosts]
+  if unknown:
+    raise HTTPException(status_code=404, detail=f"Unknown hosts: {', '.join(unknown)}")
+
+  # Filter keys are matched against host attributes and data; Nornir's own arguments are not accepted
+  reserved = sorted({"filter_obj", "filter_func"} & (request.filter or {}).keys())
+  if reserved:
+    raise HTTPException(status_code=400, detail=f"Invalid filter keys: {', '.join(reserved)}")
+  try:
+    targets = nr.filter(**request.filter) if request.filter else nr
+  except TypeError as e:
+    raise HTTPException(status_code=400, detail=f"Invalid filter {request.filter}: {e}")
+  if request.hosts:
+    wanted = set(request.hosts)
+    targets = targets.filter(filter_func=lambda h: h.name in wanted)
+  selected = sorted(targets.inventory.hosts)
+  if not selected:
+    raise HTTPException(status_code=404, detail="No hosts match the request")
+
+  events = queue.Queue()
+  processor = StreamingResultProcessor(console=False, on_record=events.put)
+
+  def run():
+    try:
+      send_config_routers(targets, [processor])
+    except Exception as e:
+      events.put({"error": str(e)})
+    finally:
+      events.put(None)
+
+  threading.Thread(target=run, daemon=True).start()
+
+  def stream():
+    yield f"event: start\ndata: {json.dumps({'hosts': selected})}\n\n"
+    while (record := events.get()) is not None:
+      event = "error" if "error" in record else "host"
+      yield f"event: {event}\ndata: {json.dumps(record)}\n\n"
+    yield f"event: summary\ndata: {json.dumps(processor.summary())}\n\n"
+    processor.close()
+
+  return StreamingResponse(stream(), media_type="text/event-stream")
+
+# Plain def: FastAPI runs these in its threadpool, so waiting on `apply_lock`
+# during a bulk push does not block the event loop
 @app.post("/apply-config/{host}")
-async def apply_config(host: str):
+def apply_config(host: str):
 
   try:
     send_config_one_router(host)
@@ -35,3 +128,14 @@ async def apply_config(host: str):
 
   except Exception as e:
     raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/rollback/{host}")
+def rollback_config(host: str, version: int | None = None):
+
+  try:
+    rollback_one_router(host, version)
+    return JSONResponse(
+      content={"status": "success", "host": host, "version": version}, status_code=200 )
+
+  except Exception as e:
+    raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,146 @@
+"""
+Synthetic NetBox-shaped fixtures for N-router fabrics.
+
+The routers are connected in an OSPF ring, share an iBGP full mesh between
+loopbacks (as in `src/config_contexts/ibgp.json`) and every `edge_every`-th
+router has an eBGP session to an ISP, like RJ-01/SP-01/DF-01 in the lab.
+The records mirror the fields of the NetBox API responses that
+`src/nornir_tasks/host_data.py` reads.
+"""
+import ipaddress
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+ASN = 65500
+ISP_ASN = 65000
+LOOPBACK_BASE = ipaddress.IPv4Address("10.0.100.0")
+P2P_BASE = ipaddress.IPv4Address("10.0.0.0")
+ISP_BASE = ipaddress.IPv4Address("100.64.0.0")
+MGMT_BASE = ipaddress.IPv4Address("172.16.0.0")
+
+
+def device_name(index: int) -> str:
+    return f"R-{index:05d}"
+
+
+def generate_fabric(size: int, edge_every: int = 8) -> dict:
+    """
+    Generates the NetBox fixtures of a `size`-router fabric.
+
+    Args:
+        size (int): Number of routers.
+        edge_every (int): Every n-th router gets an eBGP session to an ISP.
+
+    Returns:
+        dict: Lists of `devices`, `interfaces`, `ip_addresses`, `bgp_sessions` and `config_contexts`.
+    """
+    devices, interfaces, ip_addresses, bgp_sessions = [], [], [], []
+    ids = {"interface": 0, "ip": 0}
+
+    def add_interface(device, name, description, address, tags=()):
+        ids["interface"] += 1
+        ids["ip"] += 1
+        interfaces.append({
+            "id": ids["interface"],
+            "device": {"id": device["id"], "name": device["name"]},
+            "name": name,
+            "description": description,
+            "enabled": True,
+            "tags": [{"name": tag, "slug": tag.lower()} for tag in tags],
+        })
+        ip_addresses.append({
+            "id": ids["ip"],
+            "address": address,
+            "assigned_object_type": "dcim.interface",
+            "assigned_object_id": ids["interface"],
+        })
+
+    for i in range(size):
+        devices.append({
+            "id": i + 1,
+            "name": device_name(i),
+            "primary_ip4": {"address": f"{MGMT_BASE + i + 1}/16"},
+            "local_context_data": None,
+        })
+
+    for i, device in enumerate(devices):
+        add_interface(device, "mgmt0", "management", f"{MGMT_BASE + i + 1}/16")
+        add_interface(device, "lo0", f"{device['name']} loopback", f"{LOOPBACK_BASE + i + 1}/32")
+        if size > 1:
+            nxt, prev = (i + 1) % size, (i - 1) % size
+            add_interface(device, "ethernet-1/1", f"{device['name']}/{device_name(nxt)}", f"{P2P_BASE + 2 * i}/31", ["OSPF"])
+            add_interface(device, "ethernet-1/2", f"{device['name']}/{device_name(prev)}", f"{P2P_BASE + 2 * prev + 1}/31", ["OSPF"])
+        if edge_every and i % edge_every == 0:
+            local, remote = ISP_BASE + 2 * i, ISP_BASE + 2 * i + 1
+            add_interface(device, "ethernet-1/10", f"{device['name']}/ISP", f"{local}/31")
+            bgp_sessions.append({
+                "id": len(bgp_sessions) + 1,
+                "device": {"id": device["id"], "name": device["name"]},
+                "local_as": {"asn": ASN},
+                "remote_as": {"asn": ISP_ASN + i},
+                "local_address": {"address": f"{local}/31"},
+                "remote_address": {"address": f"{remote}/31"},
+                "status": {"value": "active"},
+                "description": f"{device['name']} to ISP",
+                "peer_group": {"name": "ISP"},
+                "export_policies": [{"name": "EXPORT-TO-ISP"}],
+                "import_policies": [{"name": "IMPORT-FROM-ISP"}],
+            })
+
+    config_contexts = [
+        {
+            "id": 1,
+            "name": "ibgp",
+            "weight": 1000,
+            "data": {
+                "ibgp": {
+                    "asn": ASN,
+                    "peer_group": "IBGP",
+                    "neighbors": [
+                        {"address": str(LOOPBACK_BASE + i + 1), "description": d["name"]}
+                        for i, d in enumerate(devices)
+                    ],
+                },
+            },
+        },
+        {
+            "id": 2,
+            "name": "ntp",
+            "weight": 1000,
+            "data": {
+                "ntp_servers": ["a.st1.ntp.br", "b.st1.ntp.br", "c.st1.ntp.br"],
+                "timezone": "America/Sao_Paulo",
+                "logging_servers": ["192.168.100.123"],
+            },
+        },
+    ]
+
+    return {
+        "devices": devices,
+        "interfaces": interfaces,
+        "ip_addresses": ip_addresses,
+        "bgp_sessions": bgp_sessions,
+        "config_contexts": config_contexts,
+    }
+
+
+def to_record(value):
+    """
+    Converts fixture dicts into attribute-access objects, like pynetbox records.
+    """
+    if isinstance(value, dict):
+        return SimpleNamespace(**{k: to_record(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [to_record(v) for v in value]
+    return value
+
+
+def write_fixtures(fixtures: dict, directory: Path) -> None:
+    """
+    Writes each fixture list to `<directory>/<name>.json`.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, records in fixtures.items():
+        (directory / f"{name}.json").write_text(json.dumps(records))
@@ -0,0 +1,99 @@
+"""
+Memory benchmark of the gathered host data: plain dicts vs slotted records.
+
+Builds the per-host interface and eBGP session data of a synthetic fabric
+twice, once with the dict layout the gather tasks used to store and once
+with the `records` types, and reports the memory retained by each.
+
+Usage:
+    python -m src.benchmarks.record_memory --size 5000
+"""
+import argparse
+import gc
+import tracemalloc
+
+from src.benchmarks.fabric import generate_fabric, to_record
+from src.nornir_tasks.host_data import build_interfaces, build_ebgp_sessions, group_ips_by_interface
+
+
+def dict_layout(interfaces, ips_by_interface, sessions) -> dict:
+    """
+    Builds the host data with the plain dict layout used before the record types.
+    """
+    iface_list = []
+    for iface in interfaces:
+        ips = ips_by_interface.get(iface.id)
+        if not ips:
+            continue
+        iface_list.append({
+            "name": iface.name,
+            "description": iface.description,
+            "ip": ips[0].address,
+            "enabled": iface.enabled,
+            "tags": [tag.name for tag in iface.tags]
+        })
+    ebgp_list = [{
+        "local_asn": s.local_as.asn,
+        "remote_asn": s.remote_as.asn,
+        "local_address": s.local_address.address.split("/")[0],
+        "remote_address": s.remote_address.address.split("/")[0],
+        "status": "enable" if s.status.value == "active" else "disable",
+        "description": s.description,
+        "peer_group": s.peer_group.name if s.peer_group else None,
+        "export_policy": s.export_policies[0].name if s.export_policies else None,
+        "import_policy": s.import_policies[0].name if s.import_policies else None,
+    } for s in sessions]
+    return {"interfaces": iface_list, "ebgp_sessions": ebgp_list}
+
+
+def record_layout(interfaces, ips_by_interface, sessions) -> dict:
+    data = build_interfaces(interfaces, ips_by_interface)
+    data.update(build_ebgp_sessions(sessions))
+    return data
+
+
+def measure(build, devices, interfaces, sessions, ips_by_interface) -> int:
+    """
+    Returns the bytes retained by the host data of every device built with `build`.
+    """
+    gc.collect()
+    tracemalloc.start()
+    hosts = {
+        device.name: build(interfaces.get(device.name, []), ips_by_interface, sessions.get(device.name, []))
+        for device in devices
+    }
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del hosts
+    return retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory of dict vs record host data")
+    parser.add_argument("--size", type=int, default=5000, help="Number of devices")
+    parser.add_argument("--edge-every", type=int, default=8, help="Every n-th router gets an eBGP session")
+    args = parser.parse_args()
+
+    fixtures = generate_fabric(args.size, args.edge_every)
+    devices = to_record(fixtures["devices"])
+    interfaces, sessions = {}, {}
+    for iface in to_record(fixtures["interfaces"]):
+        interfaces.setdefault(iface.device.name, []).append(iface)
+    for session in to_record(fixtures["bgp_sessions"]):
+        sessions.setdefault(session.device.name, []).append(session)
+    ips_by_interface = group_ips_by_interface(to_record(fixtures["ip_addresses"]))
+
+    dicts = measure(dict_layout, devices, interfaces, sessions, ips_by_interface)
+    records = measure(record_layout, devices, interfaces, sessions, ips_by_interface)
+
+    print(f"devices:       {args.size}")
+    print(f"interfaces:    {len(fixtures['interfaces'])}")
+    print(f"bgp sessions:  {len(fixtures['bgp_sessions'])}")
+    print(f"dicts:         {dicts / 2**20:8.2f} MiB ({dicts / args.size:,.0f} B/device)")
+    print(f"records:       {records / 2**20:8.2f} MiB ({records / args.size:,.0f} B/device)")
+    print(f"reduction:     {(1 - records / dicts) * 100:8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Offline scale test of the gather, render and diff stages on synthetic fabrics.
+
+Generates NetBox-shaped fixtures for each fabric size, builds the host data
+with the same builders as `deploy_config`, renders `srlinux.j2`, parses and
+serialises the result and diffs it against a baseline, reporting wall time
+and peak traced memory per stage.
+
+Usage:
+    python -m src.benchmarks.scale_render --sizes 10 100 500 1000
+"""
+import argparse
+import copy
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+import yaml
+from deepdiff import DeepDiff
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+from src.benchmarks.fabric import generate_fabric, to_record, write_fixtures
+from src.nornir_tasks.context_cache import deep_merge, freeze
+from src.nornir_tasks.host_data import build_interfaces, build_ebgp_sessions, group_ips_by_interface
+from src.nornir_tasks.host_model import build_host_model
+from src.nornir_tasks.validate_config import load_schema, validate_tree
+
+TEMPLATES = Path(__file__).resolve().parents[1] / "templates"
+
+
+class StageTimer:
+    """
+    Records wall time and peak traced memory of each stage of a run.
+    """
+
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages = {}
+
+    def run(self, name: str, func, *args):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        value = func(*args)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] - before if self.trace_memory else None
+        self.stages[name] = {"seconds": elapsed, "peak_mb": peak / 2**20 if peak is not None else None}
+        return value
+
+
+def gather(fixtures: dict) -> dict:
+    """
+    Builds the host data and host model of every device from the fixtures, as the gather tasks do.
+    """
+    records = {name: to_record(values) for name, values in fixtures.items()}
+    interfaces, sessions = {}, {}
+    for iface in records["interfaces"]:
+        interfaces.setdefault(iface.device.name, []).append(iface)
+    for session in records["bgp_sessions"]:
+        sessions.setdefault(session.device.name, []).append(session)
+    ips_by_interface = group_ips_by_interface(records["ip_addresses"])
+
+    shared = {}
+    for context in sorted(fixtures["config_contexts"], key=lambda c: (c["weight"], c["name"])):
+        shared = deep_merge(shared, context["data"])
+    shared = {key: freeze(value) for key, value in shared.items()}
+
+    hosts = {}
+    for device in records["devices"]:
+        data = dict(shared)
+        data.update(build_interfaces(interfaces.get(device.name, []), ips_by_interface))
+        data.update(build_ebgp_sessions(sessions.get(device.name, [])))
+        data["model"] = build_host_model(data)
+        hosts[device.name] = SimpleNamespace(name=device.name, data=data)
+    return hosts
+
+
+def render(hosts: dict) -> dict:
+    """
+    Renders `srlinux.j2` for every host with the same Jinja2 settings as `nornir_jinja2.template_file`.
+    """
+    env = Environment(loader=FileSystemLoader(TEMPLATES), undefined=StrictUndefined, trim_blocks=True)
+    template = env.get_template("srlinux.j2")
+    return {
+        name: template.render(host=host, model=host.data["model"])
+        for name, host in hosts.items()
+    }
+
+
+def parse(rendered: dict) -> dict:
+    return {name: yaml.safe_load(text) for name, text in rendered.items()}
+
+
+def validate(parsed: dict) -> int:
+    load_schema()
+    return sum(1 for tree in parsed.values() if validate_tree(tree))
+
+
+def serialise(parsed: dict) -> dict:
+    return {name: json.dumps(tree, indent=2) for name, tree in parsed.items()}
+
+
+def diff(parsed: dict, baseline: dict) -> int:
+    return sum(1 for name, tree in parsed.items() if DeepDiff(baseline.get(name), tree))
+
+
+def drop_last_neighbor(parsed: dict) -> dict:
+    """
+    Builds a diff baseline that lacks the last iBGP neighbor, as before adding a router to the mesh.
+    """
+    baseline = copy.deepcopy(parsed)
+    for tree in baseline.values():
+        neighbors = tree["network-instance"][0]["protocols"]["bgp"]["neighbor"]
+        ibgp = [n for n in neighbors if n.get("peer-group") == "IBGP"]
+        if ibgp:
+            neighbors.remove(ibgp[-1])
+    return baseline
+
+
+def run(size: int, edge_every: int, trace_memory: bool, fixtures_dir: Path | None = None) -> dict:
+    """
+    Runs every stage for one fabric size and returns the per-stage measurements.
+    """
+    timer = StageTimer(trace_memory)
+    fixtures = timer.run("generate", generate_fabric, size, edge_every)
+    if fixtures_dir:
+        write_fixtures(fixtures, fixtures_dir / f"fabric-{size}")
+    hosts = timer.run("gather", gather, fixtures)
+    rendered = timer.run("render", render, hosts)
+    parsed = timer.run("parse", parse, rendered)
+    invalid = timer.run("validate", validate, parsed)
+    serialised = timer.run("serialise", serialise, parsed)
+    baseline = drop_last_neighbor(parsed)
+    changed = timer.run("diff", diff, parsed, baseline)
+
+    config_bytes = sum(len(text) for text in serialised.values())
+    return {
+        "size": size,
+        "stages": timer.stages,
+        "total_seconds": sum(s["seconds"] for s in timer.stages.values()),
+        "config_bytes": config_bytes,
+        "bytes_per_host": config_bytes / size,
+        "hosts_invalid": invalid,
+        "hosts_changed": changed,
+    }
+
+
+def print_report(reports: list) -> None:
+    stages = list(reports[0]["stages"])
+    header = f"{'size':>7} " + " ".join(f"{s:>16}" for s in stages) + f" {'total s':>9} {'KiB/host':>9}"
+    print(header)
+    print("-" * len(header))
+    for report in reports:
+        cells = []
+        for stage in stages:
+            m = report["stages"][stage]
+            mem = f"/{m['peak_mb']:.1f}MB" if m["peak_mb"] is not None else ""
+            cells.append(f"{m['seconds']:.3f}s{mem}")
+        print(
+            f"{report['size']:>7} " + " ".join(f"{c:>16}" for c in cells)
+            + f" {report['total_seconds']:>9.2f} {report['bytes_per_host'] / 1024:>9.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scale-test rendering on synthetic SR Linux fabrics")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 250, 500])
+    parser.add_argument("--edge-every", type=int, default=8, help="Every n-th router gets an eBGP session")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (faster, no memory figures)")
+    parser.add_argument("--fixtures", type=Path, help="Also write the generated fixtures to this directory")
+    parser.add_argument("--json", type=Path, help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    if not args.no_memory:
+        tracemalloc.start()
+    reports = [run(size, args.edge_every, not args.no_memory, args.fixtures) for size in args.sizes]
+    print_report(reports)
+    if args.json:
+        args.json.write_text(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Versioned, content-addressed store for rendered configurations.
+
+Every rendered or pushed configuration is kept per host. Containers (dicts
+and lists) are stored as zlib-compressed objects addressed by the SHA-256 of
+their canonical JSON, with nested containers replaced by references, so
+identical subtrees such as `routing-policy` or the NTP servers are stored
+once for the whole fleet. Each host has an append-only JSON-lines index of
+versions, which makes "last known good" a lookup instead of a re-render, and
+a small head file with the last version and the latest record per status, so
+recording a version or looking up the last push does not read the history.
+
+Layout:
+    src/config_store/objects/<2 hex>/<sha256>   compressed tree nodes
+    src/config_store/index/<host>.jsonl         version history per host
+    src/config_store/index/<host>.head.json     last version and latest record per status
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+
+STORE_DIR = Path("src/config_store")
+
+# Statuses considered safe to roll back to, most trusted last.
+GOOD_STATUSES = ("pushed", "verified")
+
+_REF = "$ref"
+
+
+def _canonical(value) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":")).encode()
+
+
+class ConfigStore:
+    """
+    Stores configuration versions per host with subtree deduplication.
+
+    Args:
+        root (Path): Directory holding the objects and the host indexes.
+    """
+
+    def __init__(self, root: Path = STORE_DIR):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.index = self.root / "index"
+        self._lock = threading.Lock()
+        self._load_object = lru_cache(maxsize=4096)(self._read_object)
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest
+
+    def _write_object(self, node) -> str:
+        data = _canonical(node)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+            tmp.write_bytes(zlib.compress(data, 6))
+            os.replace(tmp, path)
+        return digest
+
+    def _read_object(self, digest: str):
+        return json.loads(zlib.decompress(self._object_path(digest).read_bytes()))
+
+    def _put(self, value) -> str:
+        if isinstance(value, dict):
+            node = {k: self._ref(v) for k, v in value.items()}
+        else:
+            node = [self._ref(v) for v in value]
+        return self._write_object(node)
+
+    def _ref(self, value):
+        if isinstance(value, (dict, list)):
+            return {_REF: self._put(value)}
+        return value
+
+    def _resolve(self, value):
+        if isinstance(value, dict):
+            if _REF in value and len(value) == 1:
+                return self.load(value[_REF])
+            return {k: self._resolve(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._resolve(v) for v in value]
+        return value
+
+    def load(self, digest: str):
+        """
+        Rebuilds the configuration tree stored under `digest`.
+        """
+        return self._resolve(self._load_object(digest))
+
+    def _index_path(self, host: str) -> Path:
+        return self.index / f"{host}.jsonl"
+
+    def _head_path(self, host: str) -> Path:
+        return self.index / f"{host}.head.json"
+
+    @staticmethod
+    def _advance(head: dict, entry: dict) -> None:
+        head["version"] = entry["version"]
+        head["latest"] = entry
+        head["statuses"][entry["status"]] = entry
+
+    def head(self, host: str) -> dict:
+        """
+        Returns the last version of a host and its latest record overall and per status.
+
+        The head file is rebuilt from the history if it is missing.
+        """
+        try:
+            return json.loads(self._head_path(host).read_text())
+        except FileNotFoundError:
+            head = {"version": 0, "latest": None, "statuses": {}}
+            for entry in self.history(host):
+                self._advance(head, entry)
+            return head
+
+    def history(self, host: str) -> list:
+        """
+        Returns all version records for a host, oldest first.
+        """
+        path = self._index_path(host)
+        if not path.exists():
+            return []
+        with open(path, "r") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def record(self, host: str, digest: str, status: str) -> dict:
+        """
+        Appends a version record pointing at an already stored tree.
+
+        Args:
+            host (str): The device name.
+            digest (str): The root object hash.
+            status (str): Lifecycle status, e.g. "rendered", "pushed" or "failed".
+
+        Returns:
+            dict: The appended record.
+        """
+        with self._lock:
+            head = self.head(host)
+            entry = {
+                "version": head["version"] + 1,
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "root": digest,
+                "status": status,
+            }
+            self.index.mkdir(parents=True, exist_ok=True)
+            with open(self._index_path(host), "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._advance(head, entry)
+            path = self._head_path(host)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(head))
+            os.replace(tmp, path)
+        return entry
+
+    def commit(self, host: str, config: dict, status: str = "rendered") -> dict:
+        """
+        Stores a configuration tree and records it as a new version of `host`.
+        """
+        return self.record(host, self._put(config), status)
+
+    def get(self, host: str, version: int | None = None) -> dict | None:
+        """
+        Returns the configuration of a host at `version`, or the latest one.
+        """
+        if version is None:
+            entry = self.head(host)["latest"]
+        else:
+            entry = next((e for e in self.history(host) if e["version"] == version), None)
+        return self.load(entry["root"]) if entry else None
+
+    def latest(self, host: str, status: str | None = None) -> dict | None:
+        """
+        Returns the most recent version record of a host, optionally with a given status.
+        """
+        head = self.head(host)
+        return head["latest"] if status is None else head["statuses"].get(status)
+
+    def last_known_good(self, host: str) -> dict | None:
+        """
+        Returns the most recent version record with the most trusted status in `GOOD_STATUSES`.
+
+        The config of the latest push is what the device runs now, so versions
+        with the same tree are skipped: rolling back always changes the config.
+        """
+        current = self.latest(host, status="pushed")
+        current_root = current["root"] if current else None
+        history = self.history(host)
+        for status in reversed(GOOD_STATUSES):
+            for entry in reversed(history):
+                if entry["status"] == status and entry["root"] != current_root:
+                    return entry
+        return None
@@ -0,0 +1,175 @@
+"""
+Shared configuration context cache.
+
+NetBox renders the full config context on every device record, so the
+fleet-wide data (iBGP neighbor list, NTP and logging servers) is downloaded,
+deserialised and stored once per host. This module fetches the config context
+objects once per run, merges them per device locally and interns the result,
+so all hosts reference the same read-only objects and only the device's own
+local context data is stored per host.
+"""
+import json
+import threading
+from types import MappingProxyType
+
+# Config context assignment fields that can be evaluated from the device record.
+DEVICE_CRITERIA = {
+    "sites": "site",
+    "device_types": "device_type",
+    "roles": "role",
+    "platforms": "platform",
+    "tenants": "tenant",
+}
+
+# Assignment fields that need extra lookups (region/group/location hierarchies, clusters).
+# Devices that may be matched by contexts using them fall back to NetBox's rendered context.
+UNRESOLVED_CRITERIA = (
+    "regions",
+    "locations",
+    "site_groups",
+    "tenant_groups",
+    "cluster_types",
+    "cluster_groups",
+    "clusters",
+)
+
+
+def freeze(value):
+    """
+    Returns a read-only copy of a JSON-like value (dicts become mapping proxies, lists become tuples).
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """
+    Returns a plain, mutable and JSON-serialisable copy of a value produced by `freeze`.
+    """
+    if isinstance(value, (dict, MappingProxyType)):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(v) for v in value]
+    return value
+
+
+def deep_merge(base: dict, override: dict) -> dict:
+    """
+    Merges `override` into a copy of `base` the same way NetBox merges config contexts.
+    """
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _ids(records) -> set:
+    return {getattr(r, "id", r) for r in records or []}
+
+
+def _tag_slugs(records) -> set:
+    return {getattr(r, "slug", r) for r in records or []}
+
+
+class SharedContextStore:
+    """
+    Resolves device config contexts from a single fleet-wide fetch of the NetBox config context objects.
+
+    Args:
+        nb: A pynetbox API object.
+    """
+
+    def __init__(self, nb):
+        self._nb = nb
+        self._lock = threading.Lock()
+        self._contexts = None
+        self._interned = {}
+        self._merged = {}
+
+    def reset(self) -> None:
+        """
+        Drops the fetched contexts and merged results, so the next run fetches them again.
+        """
+        with self._lock:
+            self._contexts = None
+            self._interned = {}
+            self._merged = {}
+
+    def _load(self) -> list:
+        with self._lock:
+            if self._contexts is None:
+                contexts = self._nb.extras.config_contexts.filter(is_active=True)
+                self._contexts = sorted(contexts, key=lambda c: (c.weight, c.name))
+        return self._contexts
+
+    def intern(self, value):
+        """
+        Returns the shared read-only instance of `value`, creating it on first use.
+        """
+        key = json.dumps(value, sort_keys=True, default=str)
+        with self._lock:
+            frozen = self._interned.get(key)
+            if frozen is None:
+                frozen = self._interned[key] = freeze(value)
+        return frozen
+
+    def _matches(self, context, device) -> bool:
+        for field, attribute in DEVICE_CRITERIA.items():
+            wanted = _ids(getattr(context, field, None))
+            if wanted and getattr(getattr(device, attribute, None), "id", None) not in wanted:
+                return False
+        wanted_tags = _tag_slugs(getattr(context, "tags", None))
+        if wanted_tags and not wanted_tags & _tag_slugs(device.tags):
+            return False
+        return True
+
+    def _base_context(self, contexts: tuple) -> dict:
+        ids = tuple(c.id for c in contexts)
+        with self._lock:
+            base = self._merged.get(ids)
+        if base is None:
+            merged = {}
+            for context in contexts:
+                merged = deep_merge(merged, context.data or {})
+            base = {key: self.intern(value) for key, value in merged.items()}
+            with self._lock:
+                self._merged[ids] = base
+        return base
+
+    def context_for(self, name: str) -> dict:
+        """
+        Returns the config context for a device, keyed like NetBox's rendered `config_context`.
+
+        Shared values are interned and read-only; only keys overridden by the
+        device's local context data produce per-device objects.
+
+        Args:
+            name (str): The device name.
+
+        Returns:
+            dict: The merged config context, or an empty dict if the device does not exist.
+        """
+        contexts = self._load()
+        device = self._nb.dcim.devices.get(name=name, exclude="config_context")
+        if device is None:
+            return {}
+
+        # Contexts whose resolvable criteria already exclude the device cannot match it
+        matched = tuple(c for c in contexts if self._matches(c, device))
+        if any(getattr(c, field, None) for c in matched for field in UNRESOLVED_CRITERIA):
+            rendered = self._nb.dcim.devices.get(device.id).config_context or {}
+            return {key: self.intern(value) for key, value in rendered.items()}
+
+        context = dict(self._base_context(matched))
+        for key, value in (device.local_context_data or {}).items():
+            shared = context.get(key)
+            if isinstance(value, dict) and isinstance(shared, MappingProxyType):
+                value = deep_merge(thaw(shared), value)
+            context[key] = self.intern(value)
+        return context
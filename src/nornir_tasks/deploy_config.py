@@ -5,180 +5,273 @@ from nornir_rich.progress_bar import RichProgressBar
 from nornir.core.task import Task, Result
 from dotenv import load_dotenv
 import os
-import pynetbox
 from nornir_pygnmi.tasks import gnmi_set
 import json
 import yaml
 import logging
+import threading
+import time
+import argparse
+from pathlib import Path
+from src.nornir_tasks.config_store import ConfigStore
+from src.nornir_tasks.gather import ctx_store, get_ct_from_netbox, get_interfaces_from_netbox, get_ebgp_from_netbox
+from src.nornir_tasks.host_model import build_host_model
+from src.nornir_tasks.validate_config import validate_tree
+from src.nornir_tasks.processors import StreamingResultProcessor
+from src.nornir_tasks.state_store import state_subscriber
+from src.nornir_tasks.verify_config import verify_config
+from src.nornir_tasks.resilience import Deadline, NO_DEADLINE, breaker, run_with_timeout
+from src.nornir_tasks.profiler import SamplingProfiler
+from src.nornir_tasks.gnmi_push import COMPRESSION, chunk_updates, grpc_compression_options, managed_paths, set_request_size
+# Registers the SnapshotInventory plugin used by config-snapshot.yaml
+import src.nornir_tasks.snapshot_inventory  # noqa: F401
 
 load_dotenv(".env")
-# Connect to NetBox
-NETBOX_URL = os.getenv("NETBOX_URL")
-NETBOX_TOKEN = os.getenv("NETBOX_TOKEN")
-nb = pynetbox.api(NETBOX_URL, token=NETBOX_TOKEN)
-nr = InitNornir(config_file="config.yaml")
-
-
-def get_ct_from_netbox(task: Task) -> Result:
-    """
-    Retrieves the current configuration context from NetBox and updates the task's host data.
-
-    Args:
-        task (Task): The task to be executed.
-
-    Returns:
-        Result: A result object containing the updated host data and the retrieved configuration context.
+# config-snapshot.yaml loads the inventory from a local snapshot instead of NetBox
+NORNIR_CONFIG_FILE = os.getenv("NORNIR_CONFIG_FILE", "config.yaml")
+nr = InitNornir(config_file=NORNIR_CONFIG_FILE)
+# Version history of every rendered/pushed config
+config_store = ConfigStore()
+# Time budget in seconds of a full deploy run
+RUN_DEADLINE = 900
+# Compression algorithm of each host's open gNMI channel
+gnmi_compression = {}
+# Serialises the API-driven runs sharing `nr` and its open connections
+apply_lock = threading.Lock()
+
+
+def get_host_model(task: Task) -> Result:
     """
-    device = nb.dcim.devices.get(name=task.host.name)
-    if device and device.config_context:
-      task.host.data.update(device.config_context)
-    return Result(host=task.host, result="Got config context for {task.host.name}")
-
-def get_interfaces_from_netbox(task: Task) -> Result:
-
-    """
-    Retrieves a list of interfaces and their IP addresses from NetBox and updates the task's host data.
+    Precomputes the derived view of the host used by the templates (router-id, routed and
+    OSPF interfaces, iBGP peers and export policies) and stores it in the task's host data.
 
     Args:
         task (Task): The task to be executed.
 
     Returns:
-        Result: A result object containing the updated host data and a message indicating the interfaces were merged for the given device.
+        Result: A result object with a message indicating the model was built.
     """
-    interfaces = nb.dcim.interfaces.filter(device=task.host.name)
-    iface_list = []
-
-    for iface in interfaces:
-        ips = list(nb.ipam.ip_addresses.filter(interface_id=iface.id))
-        if not ips:
-            continue
-        ip_address = ips[0].address
-
-        iface_list.append({
-            "name": iface.name,
-            "description": iface.description,
-            "ip": ip_address,
-            "enabled": iface.enabled,
-            "tags": [tag.name for tag in iface.tags]
-        })
-
-        if iface.name.lower().startswith("lo0"):
-            lo0_ip = ip_address.split("/")[0]
-            lo0_description = iface.description
-
-
-    task.host.data.update({
-        "interfaces": iface_list,
-        "lo0_ip": lo0_ip,
-        "lo0_description": lo0_description
-        })
-    return Result(host=task.host, result="Got interfaces data for {task.host.name}")
-
-
-def get_ebgp_from_netbox(task:Task) -> Result:
-    """
-    Retrieves eBGP session details from NetBox and updates the task's host data.
-
-    Fetches active BGP sessions for the device, determines their status, and collects
-    details such as ASNs, addresses, and policies.
-
-    Args:
-        task (Task): The task to be executed.
-
-    Returns:
-        Result: A result object containing the updated host data with eBGP sessions.
-    """
-
-    bgp_sessions = nb.plugins.bgp.session.filter(device=task.host.name)
-    ebgp_list = []
-
-    for neighbor in bgp_sessions:
-
-        if neighbor.status.value == "active":
-            status = "enable"
-        else:
-            status = "disable"
-
-        ebgp_list.append({
-            "local_asn": neighbor.local_as.asn,
-            "remote_asn": neighbor.remote_as.asn,
-            "local_address":  neighbor.local_address.address.split("/")[0],
-            "remote_address": neighbor.remote_address.address.split("/")[0],
-            "status": status,
-            "description": neighbor.description,
-            "peer_group": neighbor.peer_group.name if neighbor.peer_group else None,
-            "export_policy": neighbor.export_policies[0].name if neighbor.export_policies else None,
-            "import_policy": neighbor.import_policies[0].name if neighbor.import_policies else None,
-        })
-
-    task.host.data.update({"ebgp_sessions": ebgp_list})
-    return Result(host=task.host, result="Got ebgp data for {task.host.name}")
+    task.host.data["model"] = build_host_model(task.host.data)
+    return Result(host=task.host, result=f"Built host model for {task.host.name}")
 
 
-def render_template_json(task: Task) -> Result:
+def render_template_json(task: Task, deadline: Deadline = NO_DEADLINE) -> Result:
     """
     Renders the SR Linux configuration template for a given device using Jinja2
     and writes the rendered configuration to a file.
 
+    The rendered tree is validated offline against the SR Linux model subset;
+    invalid configs fail the host and are not written, so they are never pushed.
+
     Args:
         task (Task): The task to be executed.
+        deadline (Deadline): The run's time budget. Rendering is local, so it is
+            only checked for expiry before the host is rendered.
 
     Returns:
         Result: A result object containing the updated host data and a message indicating the rendered configuration was written to a file.
     """
+    deadline.check("render")
     r = task.run(
         task=template_file,
         template="srlinux.j2",
         path="./src/templates/",
-        interfaces=task.host.data.get("interfaces", []),
-        config_context=task.host.data,
+        model=task.host.data["model"],
     )
 
     rendered = r.result
     parsed = yaml.safe_load(rendered)
+    errors = validate_tree(parsed)
+    if errors:
+        return Result(host=task.host, result="Rendered config is invalid:\n" + "\n".join(errors), failed=True)
     rendered_json = json.dumps(parsed, indent=2)
 
     filename = f"src/rendered_config/{task.host.name}.json"
     with open(filename, "w") as f:
         f.write(rendered_json)
+    config_store.commit(task.host.name, parsed, status="rendered")
 
     return Result(host=task.host, result=f"Rendered config written to {filename}")
 
 
-def push_config_gnmi(task: Task) -> Result:
+def open_gnmi(task: Task, timeout: float, compression: str = "none") -> None:
+    """
+    Opens the host's gNMI connection, if not already open, waiting at most `timeout` seconds.
+
+    A connection open with another compression algorithm is closed and reopened.
+    """
+    if "pygnmi" in task.host.connections:
+        if gnmi_compression.get(task.host.name, "none") == compression:
+            return
+        task.host.close_connection("pygnmi")
+    params = task.host.get_connection_parameters("pygnmi")
+    extras = {**(params.extras or {}), "gnmi_timeout": timeout}
+    if compression != "none":
+        extras["grpc_options"] = extras.get("grpc_options", []) + grpc_compression_options(compression)
+    task.host.open_connection("pygnmi", configuration=task.nornir.config, extras=extras)
+    gnmi_compression[task.host.name] = compression
+
+
+def push_config_gnmi(task: Task, deadline: Deadline = NO_DEADLINE, compression: str = None, chunked: bool = None) -> Result:
     """
     Pushes the rendered configuration for a given device to the device using gNMI.
 
+    Devices whose circuit is open fail immediately with the cached error
+    instead of holding a worker until the connection times out. The
+    connection and the Set are each bounded by the push stage timeout, capped
+    by the time left in the run; a Set that times out closes the connection,
+    which cancels the RPC on the device's channel.
+
+    The size of the SetRequest (before and after compression) and the Set
+    latency, excluding the connection setup, are returned in the result's `metrics`.
+
     Args:
         task (Task): The task to be executed.
+        deadline (Deadline): The run's time budget.
+        compression (str): gRPC compression, one of `COMPRESSION`. Defaults to the host's
+            `gnmi_compression` data, or no compression.
+        chunked (bool): Send one update per top-level container and list entry instead of
+            a single update of "/". Defaults to the host's `gnmi_chunked` data, or False.
 
     Returns:
         Result: A result object containing the updated host data and the result of the gNMI set operation.
     """
+    compression = compression or task.host.get("gnmi_compression") or "none"
+    chunked = chunked if chunked is not None else bool(task.host.get("gnmi_chunked", False))
     filename = f"src/rendered_config/{task.host.name}.json"
     with open(filename, "r") as f:
         rendered = f.read()
+    config = json.loads(rendered)
+    errors = validate_tree(config)
+    if errors:
+        return Result(host=task.host, result=f"{filename} is invalid:\n" + "\n".join(errors), failed=True)
+
+    updates = chunk_updates(config) if chunked else [("/", rendered)]
+    request_bytes, wire_bytes = set_request_size(updates, compression)
+
+    breaker.call(task.host, open_gnmi, task, deadline.timeout("push"), compression)
+
+    def set_config():
+        return task.run(
+            task=gnmi_set,
+            encoding="json_ietf",
+            update=updates,
+            severity_level=logging.DEBUG
+        )
+
+    # Timed on its own, so the latency excludes the connection setup and the breaker's probe
+    def push():
+        timeout = deadline.timeout("push")
+        start = time.perf_counter()
+        try:
+            r = run_with_timeout(set_config, timeout, name=f"gnmi-set-{task.host.name}")
+        except TimeoutError:
+            # pygnmi's Set has no timeout: closing the channel cancels the stalled RPC
+            task.host.close_connection("pygnmi")
+            raise TimeoutError(f"gNMI Set to {task.host.name} timed out after {timeout:.1f}s")
+        return r, time.perf_counter() - start
+
+    r, set_latency = breaker.call(task.host, push)
+    metrics = {
+        "compression": compression,
+        "updates": len(updates),
+        "request_bytes": request_bytes,
+        "wire_bytes": wire_bytes,
+        "set_latency": round(set_latency, 3),
+    }
+    config_store.commit(task.host.name, config, status="pushed")
+    return Result(host=task.host, result=r.result, metrics=metrics)
+
+
+def rollback_config_gnmi(task: Task, version: int = None) -> Result:
+    """
+    Pushes a stored configuration version back to the device using gNMI, without re-rendering.
 
+    The paths owned by the templates are replaced with the stored version and
+    the ones only the current config has are deleted, in one SetRequest, so
+    whatever the bad version added is removed. The rendered config file is
+    replaced with the rolled back version so the compliance check does not
+    re-apply the configuration that was rolled back.
 
+    Args:
+        task (Task): The task to be executed.
+        version (int): The version to push. Defaults to the last known good version
+            that differs from the config currently on the device.
+
+    Returns:
+        Result: A result object containing the result of the gNMI set operation.
+    """
+    if version is None:
+        entry = config_store.last_known_good(task.host.name)
+    else:
+        entry = next((e for e in config_store.history(task.host.name) if e["version"] == version), None)
+    if entry is None:
+        return Result(host=task.host, result=f"No stored config to roll back to for {task.host.name}", failed=True)
+
+    config = config_store.load(entry["root"])
+    target = managed_paths(config)
+    current = config_store.latest(task.host.name, status="pushed")
+    current_paths = managed_paths(config_store.load(current["root"])) if current else {}
+
+    rendered = json.dumps(config, indent=2)
     r = task.run(
         task=gnmi_set,
         encoding="json_ietf",
-        update=[
-            ("/", rendered)
-        ],
+        delete=[path for path in current_paths if path not in target],
+        # Values are passed as JSON text so string leaves are sent quoted
+        replace=[(path, json.dumps(value)) for path, value in target.items()],
         severity_level=logging.DEBUG
     )
+
+    with open(f"src/rendered_config/{task.host.name}.json", "w") as f:
+        f.write(rendered)
+    config_store.record(task.host.name, entry["root"], "pushed")
     return Result(host=task.host, result=r.result)
 
 
+def rollback_one_router(host, version=None):
+    with apply_lock:
+        results = nr.filter(name=host).run(task=rollback_config_gnmi, version=version, on_failed=True)
+    print_result(results)
+    if results.failed:
+        raise RuntimeError(f"Rollback failed for {host}")
+
+
+def send_config_routers(targets, processors=()):
+    """
+    Pushes the rendered configuration to several routers in a single Nornir run.
+
+    The run reuses the inventory loaded at import time and the gNMI connections
+    already open on its hosts, instead of initializing Nornir per request.
+
+    Args:
+        targets: A filtered view of the global `nr` object.
+        processors: Extra Nornir processors, e.g. to stream per-host progress.
+
+    Returns:
+        AggregatedResult: The results of the push.
+    """
+    with apply_lock:
+        return targets.with_processors(list(processors)).run(task=push_config_gnmi, on_failed=True)
+
+
 def send_config_one_router(host):
-    nr = InitNornir(config_file="config.yaml")
-    nr = nr.filter(name=host)
-    results = nr.run(task=push_config_gnmi)
+    results = send_config_routers(nr.filter(name=host))
     print_result(results)
+    if results.failed:
+        raise RuntimeError(f"Push failed for {host}")
+
+
+def print_push_metrics(results) -> None:
+    for host, result in results.items():
+        metrics = getattr(result[0], "metrics", None)
+        if metrics:
+            print(f"{host:<16} {metrics['compression']:<8} {metrics['updates']:>3} updates "
+                  f"{metrics['request_bytes']:>8} B -> {metrics['wire_bytes']:>8} B on wire "
+                  f"Set {metrics['set_latency'] * 1000:.0f} ms")
 
 
-def main(nr: InitNornir = nr):
+def main(nr: InitNornir = nr, compression: str = None, chunked: bool = None, profile: Path = None):
     """
     Main execution entry point for the Nornir automation script.
 
@@ -186,25 +279,68 @@ def main(nr: InitNornir = nr):
     1. Fetch config context from NetBox.
     2. Fetch interface data from NetBox.
     3. Fetch eBGP session data from NetBox.
-    4. Render configuration templates.
-    5. Push configuration via gNMI.
+    4. Precompute the host model used by the templates.
+    5. Render configuration templates.
+    6. Push configuration via gNMI, short-circuiting devices known to be unreachable,
+       and print the SetRequest size and latency per host.
+    7. Verify the expected BGP/OSPF/interface state through gNMI subscriptions.
+
+    All stages share a `RUN_DEADLINE` budget and each call is bounded by its
+    stage timeout.
+
+    Per-host results are streamed as JSON lines while the run progresses and a
+    bounded summary is printed at the end.
 
     Args:
         nr (InitNornir): The initialized Nornir object. Defaults to the global `nr` object.
+        compression (str): gRPC compression of the push. Defaults to each host's `gnmi_compression`.
+        chunked (bool): Split the push into per-path updates. Defaults to each host's `gnmi_chunked`.
+        profile (Path): If set, sample the run per stage and write folded stacks to this file.
     """
-    nr = nr.with_processors([RichProgressBar()])
-    results = nr.run(task=get_ct_from_netbox)
-    #print_result(results)
-    results = nr.run(task=get_interfaces_from_netbox)
-    #print_result(results)
-    results = nr.run(task=get_ebgp_from_netbox)
-    #print_result(results)
-    results = nr.run(task=render_template_json)
-    #print_result(results)
-    results = nr.run(task=push_config_gnmi)
-    print_result(results)
+    processor = StreamingResultProcessor(console=False)
+    nr = nr.with_processors([RichProgressBar(), processor])
+    deadline = Deadline(RUN_DEADLINE)
+    profiler = SamplingProfiler("deploy_config")
+    if profile:
+        profiler.start()
+    try:
+        with profiler.stage("gather"):
+            ctx_store.reset()
+            results = nr.run(task=get_ct_from_netbox, deadline=deadline)
+            #print_result(results)
+            results = nr.run(task=get_interfaces_from_netbox, deadline=deadline)
+            #print_result(results)
+            results = nr.run(task=get_ebgp_from_netbox, deadline=deadline)
+            #print_result(results)
+        with profiler.stage("render"):
+            results = nr.run(task=get_host_model)
+            results = nr.run(task=render_template_json, deadline=deadline)
+            #print_result(results)
+        with profiler.stage("push"):
+            # Subscribe before pushing so no state transition is missed
+            state_subscriber.start(nr.inventory.hosts.values())
+            results = nr.run(task=push_config_gnmi, deadline=deadline, compression=compression, chunked=chunked)
+            print_push_metrics(results)
+        with profiler.stage("verify"):
+            results = nr.run(task=verify_config, deadline=deadline)
+        for host, result in results.items():
+            pushed = config_store.latest(host, status="pushed")
+            if pushed and not result.failed:
+                config_store.record(host, pushed["root"], "verified")
+    finally:
+        if profile:
+            profiler.report(profile)
+    processor.print_summary()
+    processor.close()
 
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Render and push the intended config to every router")
+    parser.add_argument("--compression", choices=sorted(COMPRESSION), help="gRPC compression of the gNMI push")
+    parser.add_argument("--chunked", action=argparse.BooleanOptionalAction, default=None,
+                        help="Split the config into one update per top-level path and list entry")
+    parser.add_argument("--profile", type=Path, nargs="?", const=Path("profile/deploy_config.folded"),
+                        help="Sample the run per stage and write flamegraph folded stacks (default: %(const)s)")
+    args = parser.parse_args()
+    main(compression=args.compression, chunked=args.chunked, profile=args.profile)
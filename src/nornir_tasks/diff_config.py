@@ -1,10 +1,21 @@
 from nornir import InitNornir
 from nornir.core.task import Task, Result
-from nornir_rich.functions import print_result
+from src.nornir_tasks.processors import StreamingResultProcessor
+from src.nornir_tasks.scheduler import ComplianceScheduler
+from src.nornir_tasks.config_store import ConfigStore
+from src.nornir_tasks.profiler import SamplingProfiler
+from src.nornir_tasks.resilience import Deadline, NO_DEADLINE, STAGE_TIMEOUTS, breaker
+# Registers the SnapshotInventory plugin used by config-snapshot.yaml
+import src.nornir_tasks.snapshot_inventory  # noqa: F401
 import requests
+import hashlib
+import threading
 import json
 import urllib3
 import time
+import os
+import argparse
+from datetime import datetime
 from pathlib import Path
 
 # Disable SSL warnings for labs
@@ -17,68 +28,137 @@ LOG_FILE = "clab/configs/promtail/logs/nornir_diff_config.log"
 #FastAPI
 FASTAPI_URL = "http://localhost:8800/apply-config"
 
+# config-snapshot.yaml loads the inventory from a local snapshot instead of NetBox
+NORNIR_CONFIG_FILE = os.getenv("NORNIR_CONFIG_FILE", "config.yaml")
+
+# Base interval between two checks of the same device
+CHECK_INTERVAL = 30
+
+# Time budget in seconds of a one-shot run and of a single scheduled check
+RUN_DEADLINE = 300
+CHECK_DEADLINE = 60
+
+# State fetched with every diff to fingerprint the device's config revision
+REVISION_PATH = "/system/configuration/commit"
+
+# Per host: hashes of the rendered config and device revision at the last clean check
+clean_checks = {}
+clean_checks_lock = threading.Lock()
+
 def log_to_file(message: str):
     with open(LOG_FILE, "a") as f:
         f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - {message}\n")
 
-def jsonrpc_diff(task: Task) -> Result:
+def fingerprint(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+def jsonrpc_call(url: str, auth: tuple, calls: list, timeout: float = STAGE_TIMEOUTS["diff"]) -> list:
+    """
+    Sends several JSON-RPC calls to a device in a single batch request.
+
+    Args:
+        url (str): The device JSON-RPC endpoint.
+        auth (tuple): Username and password.
+        calls (list): (method, params) tuples.
+        timeout (float): Request timeout in seconds.
+
+    Returns:
+        list: The response object of each call, in the order of `calls`.
+    """
+    batch = [{"jsonrpc": "2.0", "id": i, "method": method, "params": params} for i, (method, params) in enumerate(calls)]
+    response = requests.post(
+        url,
+        json=batch if len(batch) > 1 else batch[0],
+        auth=auth,
+        verify=False,
+        timeout=timeout
+    )
+    body = response.json()
+    responses = {r.get("id"): r for r in (body if isinstance(body, list) else [body])}
+
+    if len(batch) > 1 and not any(i in responses for i in range(len(batch))):
+        # Device without batch support: fall back to one request per call
+        return [jsonrpc_call(url, auth, [call], timeout)[0] for call in calls]
+    return [responses.get(i, {"error": {"message": "No response for call"}}) for i in range(len(batch))]
+
+def jsonrpc_diff(task: Task, deadline: Deadline = NO_DEADLINE) -> Result:
     """
     Executes a JSON-RPC diff and sends the individual metric per device to the Pushgateway.
+
+    The diff and a get of the device's commit history are sent in one batch
+    request. When the rendered config and the commit history are unchanged
+    since the last clean check, only the commit history is fetched and the
+    full diff is skipped.
+
+    Calls are bounded by the run's deadline, and devices whose circuit is
+    open are reported non-compliant immediately with the cached error.
     """
     # Load expected configuration from local file
     config_file = Path(f"src/rendered_config/{task.host.name}.json")
     if not config_file.exists():
         return Result(host=task.host, result=f"Arquivo {config_file} não encontrado", failed=True)
 
-    rendered_config = json.loads(config_file.read_text())
-
-    # Build JSON-RPC Payload
-    payload = {
-        "jsonrpc": "2.0",
-        "id": 0,
-        "method": "diff",
-        "params": {
-            "commands": [
-                {
-                    "action": "update",
-                    "path": "/",
-                    "value": rendered_config
-                }
-            ],
-            "output-format": "text"
-        }
-    }
+    rendered = config_file.read_bytes()
+    config_hash = hashlib.sha256(rendered).hexdigest()
+
+    # JSON-RPC calls
+    diff_call = ("diff", {
+        "commands": [
+            {
+                "action": "update",
+                "path": "/",
+                "value": json.loads(rendered)
+            }
+        ],
+        "output-format": "json"
+    })
+    revision_call = ("get", {
+        "commands": [
+            {
+                "path": REVISION_PATH,
+                "datastore": "state"
+            }
+        ]
+    })
 
     # Inventory connection details
     host = task.host.hostname
-    user = task.host.username
-    password = task.host.password
+    auth = (task.host.username, task.host.password)
     url = f"https://{host}/jsonrpc"
 
     try:
-        # Send request to the device
-        response = requests.post(
-            url,
-            json=payload,
-            auth=(user, password),
-            verify=False,
-            timeout=10
-        )
-        result = response.json()
+        diff = None
+        with clean_checks_lock:
+            cached = clean_checks.get(task.host.name)
 
-        # Determine Compliance
-        # If 'result' is empty [], it means there are no differences
-        if "result" in result and result["result"] == []:
+        if cached and cached["config"] == config_hash:
+            # Same intent as the last clean check: only compare the device revision
+            revision = breaker.call(task.host, jsonrpc_call, url, auth, [revision_call], deadline.timeout("diff"))[0]
+            if "result" in revision and fingerprint(revision["result"]) == cached["revision"]:
+                diff = {"result": []}
+                diff_output = "✅ Config matches (revision unchanged since last clean check)"
+
+        if diff is None:
+            diff, revision = breaker.call(task.host, jsonrpc_call, url, auth, [diff_call, revision_call], deadline.timeout("diff"))
             diff_output = "✅ Config matches (no differences)"
+
+        # Determine Compliance
+        # If 'result' is empty, it means there are no differences
+        if "result" in diff and not any(diff["result"]):
             compliance_value = 1
             log_to_file(f"{task.host.name}: {diff_output}")
+            with clean_checks_lock:
+                if "result" in revision:
+                    clean_checks[task.host.name] = {"config": config_hash, "revision": fingerprint(revision["result"])}
 
         else:
-            diff_text = "\n".join(result.get("result", ["Erro ao ler diff"]))
+            with clean_checks_lock:
+                clean_checks.pop(task.host.name, None)
+            diff_text = json.dumps(diff.get("result", diff.get("error", "Erro ao ler diff")), indent=2)
             diff_output = f"❌ Config does not match:\n{diff_text}"
             compliance_value = 0
             try:
-                requests.post(f"{FASTAPI_URL}/{task.host.name}", timeout=60)
+                requests.post(f"{FASTAPI_URL}/{task.host.name}", timeout=deadline.timeout("remediate"))
                 log_to_file(f"{task.host.name}: {diff_output}")
             except Exception as e:
                 log_to_file(f"Error to send a post to FASTAPI for {task.host.name}: {e}")
@@ -104,32 +184,104 @@ def jsonrpc_diff(task: Task) -> Result:
     return Result(
         host=task.host,
         result=diff_output,
+        compliant=compliance_value == 1,
     )
 
-def main():
+def main(profile: Path = None):
     """
     Main execution entry point for the Nornir automation script.
 
     Initializes Nornir with a configuration file, executes a series of tasks
-    in parallel on all hosts, and displays the formatted result on the console.
+    in parallel on all hosts, and streams each host's result to the console and
+    to a JSON-lines file as soon as it completes.
 
     Tasks executed in parallel on all hosts:
 
-    1. Fetch current configuration from the device using json-rpc.
-    2. Fetch desired configuration from the device using json-rpc.
-    3. Determine compliance by comparing the current and desired configurations.
-    4. Send a metric to Pushgateway with the compliance result.
+    1. Diff the desired configuration against the device and fetch its commit
+       history in one json-rpc batch (or only the commit history if nothing
+       changed since the last clean check).
+    2. Determine compliance from the structured diff.
+    3. Send a metric to Pushgateway with the compliance result.
+
+    Args:
+        profile (Path): If set, sample the run and write folded stacks to this file.
+    """
+    profiler = SamplingProfiler("diff_config")
+    if profile:
+        profiler.start()
+    try:
+        processor = StreamingResultProcessor()
+        with profiler.stage("inventory"):
+            nr = InitNornir(config_file=NORNIR_CONFIG_FILE).with_processors([processor])
+
+        # Execute the task in parallel on all hosts
+        with profiler.stage("diff"):
+            nr.run(task=jsonrpc_diff, deadline=Deadline(RUN_DEADLINE))
+    finally:
+        if profile:
+            profiler.report(profile)
+
+    # Display the run summary on the console
+    processor.print_summary()
+    processor.close()
+
+def last_deploy(config_store: ConfigStore, host: str) -> float | None:
+    """
+    Returns the epoch of the last push to a device recorded in the config store, or None.
+    """
+    entry = config_store.latest(host, status="pushed")
+    if entry is None:
+        return None
+    return datetime.strptime(entry["timestamp"], "%Y-%m-%dT%H:%M:%S%z").timestamp()
+
+
+def schedule(profile: Path = None):
     """
-    nr = InitNornir(config_file="config.yaml")
+    Runs compliance checks continuously, spread across `CHECK_INTERVAL` with jitter.
 
-    # Execute the task in parallel on all hosts
-    results = nr.run(task=jsonrpc_diff)
+    Each device is checked in its own single-host run when it becomes due, so
+    devices, the Pushgateway and the FastAPI remediation endpoint see a flat
+    load instead of a burst every interval. Devices that drift or were deployed
+    recently are checked more often; devices that stay compliant back off.
+    Unreachable devices are short-circuited by the circuit breaker, so they
+    only cost a reachability probe instead of a worker blocked on timeouts.
+
+    Args:
+        profile (Path): If set, sample the checks and write folded stacks to this file on exit.
+    """
+    profiler = SamplingProfiler("diff_config")
+    if profile:
+        profiler.start()
+    processor = StreamingResultProcessor()
+    with profiler.stage("inventory"):
+        nr = InitNornir(config_file=NORNIR_CONFIG_FILE).with_processors([processor])
+    config_store = ConfigStore()
+
+    def check(host: str) -> bool:
+        result = nr.filter(name=host).run(task=jsonrpc_diff, deadline=Deadline(CHECK_DEADLINE), on_failed=True)[host]
+        return not getattr(result[0], "compliant", False)
+
+    scheduler = ComplianceScheduler(
+        nr.inventory.hosts,
+        interval=CHECK_INTERVAL,
+        last_deploy=lambda host: last_deploy(config_store, host),
+    )
+    try:
+        with profiler.stage("diff"):
+            scheduler.run(check, workers=nr.config.runner.options.get("num_workers", 10))
+    finally:
+        if profile:
+            profiler.report(profile)
 
-    # Display the formatted result on the console
-    print_result(results)
 
 if __name__ == "__main__":
-    print("Start compliance check on all devices (Loop every 30s)...")
-    while True:
-        main()
-        time.sleep(30)
+    parser = argparse.ArgumentParser(description="Check continuously that every router runs its intended config")
+    parser.add_argument("--profile", type=Path, nargs="?", const=Path("profile/diff_config.folded"),
+                        help="Sample the checks and write flamegraph folded stacks on exit (default: %(const)s)")
+    parser.add_argument("--once", action="store_true", help="Check every device once and exit")
+    args = parser.parse_args()
+    if args.once:
+        main(profile=args.profile)
+    else:
+        print(f"Start compliance checks on all devices (spread over {CHECK_INTERVAL}s, adaptive per device)...")
+        schedule(profile=args.profile)
@@ -0,0 +1,82 @@
+"""
+Nornir tasks gathering the intended state of each router from NetBox.
+
+Kept apart from `deploy_config` so they can be imported (e.g. by the
+inventory snapshot export) without initializing Nornir.
+"""
+from dotenv import load_dotenv
+import os
+import pynetbox
+from nornir.core.task import Task, Result
+from src.nornir_tasks.context_cache import SharedContextStore
+from src.nornir_tasks.host_data import build_interfaces, build_ebgp_sessions, group_ips_by_interface
+from src.nornir_tasks.resilience import Deadline, NO_DEADLINE, STAGE_TIMEOUTS, TimeoutSession
+
+load_dotenv(".env")
+# Connect to NetBox
+NETBOX_URL = os.getenv("NETBOX_URL")
+NETBOX_TOKEN = os.getenv("NETBOX_TOKEN")
+nb = pynetbox.api(NETBOX_URL, token=NETBOX_TOKEN)
+# Each task narrows the timeout of its own requests to the time left in its run
+nb.http_session = TimeoutSession(STAGE_TIMEOUTS["gather"])
+# Config contexts shared by the whole fleet, fetched once per run (reset by each run)
+ctx_store = SharedContextStore(nb)
+
+
+def get_ct_from_netbox(task: Task, deadline: Deadline = NO_DEADLINE) -> Result:
+    """
+    Retrieves the current configuration context from NetBox and updates the task's host data.
+
+    Fleet-wide contexts are resolved once by `ctx_store` and shared read-only
+    between hosts; only the device's local context data is stored per host.
+
+    Args:
+        task (Task): The task to be executed.
+        deadline (Deadline): The run's time budget.
+
+    Returns:
+        Result: A result object containing the updated host data and the retrieved configuration context.
+    """
+    with nb.http_session.limit(deadline.timeout("gather")):
+        config_context = ctx_store.context_for(task.host.name)
+    if config_context:
+      task.host.data.update(config_context)
+    return Result(host=task.host, result="Got config context for {task.host.name}")
+
+def get_interfaces_from_netbox(task: Task, deadline: Deadline = NO_DEADLINE) -> Result:
+
+    """
+    Retrieves a list of interfaces and their IP addresses from NetBox and updates the task's host data.
+
+    Args:
+        task (Task): The task to be executed.
+        deadline (Deadline): The run's time budget.
+
+    Returns:
+        Result: A result object containing the updated host data and a message indicating the interfaces were merged for the given device.
+    """
+    with nb.http_session.limit(deadline.timeout("gather")):
+        interfaces = nb.dcim.interfaces.filter(device=task.host.name)
+        ips_by_interface = group_ips_by_interface(nb.ipam.ip_addresses.filter(device=task.host.name))
+        task.host.data.update(build_interfaces(interfaces, ips_by_interface))
+    return Result(host=task.host, result="Got interfaces data for {task.host.name}")
+
+
+def get_ebgp_from_netbox(task:Task, deadline: Deadline = NO_DEADLINE) -> Result:
+    """
+    Retrieves eBGP session details from NetBox and updates the task's host data.
+
+    Fetches active BGP sessions for the device, determines their status, and collects
+    details such as ASNs, addresses, and policies.
+
+    Args:
+        task (Task): The task to be executed.
+        deadline (Deadline): The run's time budget.
+
+    Returns:
+        Result: A result object containing the updated host data with eBGP sessions.
+    """
+    with nb.http_session.limit(deadline.timeout("gather")):
+        bgp_sessions = nb.plugins.bgp.session.filter(device=task.host.name)
+        task.host.data.update(build_ebgp_sessions(bgp_sessions))
+    return Result(host=task.host, result="Got ebgp data for {task.host.name}")
@@ -0,0 +1,91 @@
+"""
+Helpers to shape gNMI SetRequests for large configs.
+
+A rendered config can be sent as a single update of "/" or split into one
+update per top-level container and per list entry (e.g. "/system",
+"/interface[name=ethernet-1/1]") inside the same SetRequest, which the device
+applies in one transaction. The gRPC channel can also compress messages.
+`set_request_size` reports the bytes a SetRequest takes on the wire so both
+options can be compared per host and platform.
+"""
+import gzip
+import zlib
+
+import grpc
+from pygnmi.client import construct_update_message
+from pygnmi.spec.v080.gnmi_pb2 import SetRequest
+
+from src.nornir_tasks.validate_config import load_schema
+
+COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+
+def grpc_compression_options(compression: str) -> list:
+    """
+    Returns the gRPC channel options enabling message compression.
+    """
+    return [("grpc.default_compression_algorithm", int(COMPRESSION[compression]))]
+
+
+def chunk_updates(config: dict) -> list:
+    """
+    Splits a config tree into one (path, value) update per top-level container and list entry.
+
+    Args:
+        config (dict): The rendered config.
+
+    Returns:
+        list: (path, value) tuples covering the whole tree.
+    """
+    schema = load_schema()
+    updates = []
+    for name, value in config.items():
+        node = schema.get(name)
+        if node is not None and node.kind == "list":
+            for entry in value if isinstance(value, list) else [value]:
+                updates.append((f"/{name}[{node.key}={entry[node.key]}]", entry))
+        else:
+            updates.append((f"/{name}", value))
+    return updates
+
+
+def set_request_size(updates: list, compression: str = "none", encoding: str = "json_ietf") -> tuple:
+    """
+    Returns the serialised size of a SetRequest with `updates`, before and after compression.
+    """
+    payload = SetRequest(update=construct_update_message(user_list=updates, encoding=encoding)).SerializeToString()
+    if compression == "gzip":
+        return len(payload), len(gzip.compress(payload))
+    if compression == "deflate":
+        return len(payload), len(zlib.compress(payload))
+    return len(payload), len(payload)
+
+
+def _managed(children: dict, value: dict, path: str, paths: dict) -> None:
+    for name, child in value.items():
+        node = children.get(name)
+        child_path = f"{path}/{name}"
+        if node is not None and node.kind == "container" and isinstance(child, dict):
+            _managed(node.children, child, child_path, paths)
+        elif node is not None and node.kind == "list":
+            for entry in child if isinstance(child, list) else [child]:
+                paths[f"{child_path}[{node.key}={entry[node.key]}]"] = entry
+        else:
+            paths[child_path] = child
+
+
+def managed_paths(config: dict) -> dict:
+    """
+    Returns a config tree as {path: value} of the list entries and leaves the templates own.
+
+    Replacing these paths, and deleting the ones another version has but this
+    one lacks, sets exactly the rendered part of the device config without
+    touching the rest (management network-instance, AAA, gNMI server).
+    """
+    paths = {}
+    _managed(load_schema(), config, "", paths)
+    return paths
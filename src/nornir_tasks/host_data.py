@@ -0,0 +1,92 @@
+"""
+Builders turning NetBox records into the host data used by the templates.
+
+They only read record attributes, so they work the same on pynetbox records
+fetched by `deploy_config` and on the synthetic fixtures of `src/benchmarks`.
+The results are compact `records` objects rather than dicts.
+"""
+from src.nornir_tasks.records import BgpSession, Interface
+
+
+def build_interfaces(interfaces, ips_by_interface: dict) -> dict:
+    """
+    Builds the interface list and loopback data of a device.
+
+    Args:
+        interfaces: The device's interface records.
+        ips_by_interface (dict): IP address records keyed by interface id.
+
+    Returns:
+        dict: The `interfaces` (`Interface` records), `lo0_ip` and `lo0_description` host data.
+    """
+    iface_list = []
+    lo0_ip = None
+    lo0_description = None
+
+    for iface in interfaces:
+        ips = ips_by_interface.get(iface.id)
+        if not ips:
+            continue
+        ip_address = ips[0].address
+
+        iface_list.append(Interface.create(
+            name=iface.name,
+            description=iface.description,
+            ip=ip_address,
+            enabled=iface.enabled,
+            tags=[tag.name for tag in iface.tags],
+        ))
+
+        if iface.name.lower().startswith("lo0"):
+            lo0_ip = ip_address.split("/")[0]
+            lo0_description = iface.description
+
+    return {
+        "interfaces": iface_list,
+        "lo0_ip": lo0_ip,
+        "lo0_description": lo0_description
+    }
+
+
+def build_ebgp_sessions(bgp_sessions) -> dict:
+    """
+    Builds the eBGP session list of a device.
+
+    Args:
+        bgp_sessions: The device's BGP session records (netbox-bgp plugin).
+
+    Returns:
+        dict: The `ebgp_sessions` host data (`BgpSession` records).
+    """
+    ebgp_list = []
+
+    for neighbor in bgp_sessions:
+
+        if neighbor.status.value == "active":
+            status = "enable"
+        else:
+            status = "disable"
+
+        ebgp_list.append(BgpSession.create(
+            local_asn=neighbor.local_as.asn,
+            remote_asn=neighbor.remote_as.asn,
+            local_address=neighbor.local_address.address.split("/")[0],
+            remote_address=neighbor.remote_address.address.split("/")[0],
+            status=status,
+            description=neighbor.description,
+            peer_group=neighbor.peer_group.name if neighbor.peer_group else None,
+            export_policy=neighbor.export_policies[0].name if neighbor.export_policies else None,
+            import_policy=neighbor.import_policies[0].name if neighbor.import_policies else None,
+        ))
+
+    return {"ebgp_sessions": ebgp_list}
+
+
+def group_ips_by_interface(ip_addresses) -> dict:
+    """
+    Groups IP address records by the id of the interface they are assigned to.
+    """
+    grouped = {}
+    for ip in ip_addresses:
+        grouped.setdefault(ip.assigned_object_id, []).append(ip)
+    return grouped
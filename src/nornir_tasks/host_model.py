@@ -0,0 +1,47 @@
+"""
+Precomputed per-host view consumed by the templates.
+
+The templates used to derive the loopback, routed and OSPF interfaces and
+the iBGP peers with Jinja filter chains on every render. They are computed
+once here, after the NetBox gather tasks, so the templates only emit values.
+"""
+
+
+def build_host_model(data) -> dict:
+    """
+    Builds the template model of a host from its gathered data.
+
+    Args:
+        data: The host data (config context, `interfaces`, `lo0_ip` and `ebgp_sessions`).
+
+    Returns:
+        dict: The derived view of the host:
+            - router_id: loopback address used as OSPF and BGP router-id.
+            - routed_interfaces: interfaces with an address, except mgmt0.
+            - instance_interfaces: names of the enabled interfaces of the default network-instance.
+            - ospf_interfaces: names of the OSPF-tagged interfaces, except lo0.
+            - ibgp: asn, peer_group and the iBGP peers excluding the host itself.
+            - ebgp_sessions: the eBGP sessions.
+            - export_policies: unique export policy names used by the eBGP sessions.
+    """
+    interfaces = data.get("interfaces", [])
+    router_id = data.get("lo0_ip")
+    ibgp = data.get("ibgp") or {}
+    ebgp_sessions = data.get("ebgp_sessions", [])
+
+    routed_interfaces = [iface for iface in interfaces if iface.name != "mgmt0"]
+    return {
+        "router_id": router_id,
+        "routed_interfaces": routed_interfaces,
+        "instance_interfaces": [iface.name for iface in routed_interfaces if iface.enabled],
+        "ospf_interfaces": [
+            iface.name for iface in routed_interfaces if "OSPF" in iface.tags and iface.name != "lo0"
+        ],
+        "ibgp": {
+            "asn": ibgp.get("asn"),
+            "peer_group": ibgp.get("peer_group"),
+            "peers": [n for n in ibgp.get("neighbors", []) if n["address"] != router_id],
+        },
+        "ebgp_sessions": ebgp_sessions,
+        "export_policies": list(dict.fromkeys(s.export_policy for s in ebgp_sessions if s.export_policy)),
+    }
@@ -0,0 +1,212 @@
+"""
+Nornir processors that stream results as hosts finish.
+
+`StreamingResultProcessor` writes one JSON line per host and task as soon as
+the host completes (and optionally a compact console line), keeping only
+bounded per-task counters and the most recent failures in memory. The
+JSON-lines file is shipped to Loki by Promtail and can be followed by the
+FastAPI service with the async `follow`.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from nornir.core.inventory import Host
+from nornir.core.task import AggregatedResult, MultiResult, Task
+
+RESULTS_LOG = Path("clab/configs/promtail/logs/nornir_results.jsonl")
+
+
+class StreamingResultProcessor:
+    """
+    Emits a JSON line per completed host and keeps bounded run summaries.
+
+    Args:
+        path (Path): JSON-lines file to append to. None disables the file output.
+        console (bool): Also print a compact status line per host.
+        max_failures (int): Number of recent failures kept in `summary()`.
+        max_result_chars (int): Longer results are truncated in the output.
+        release (bool): Drop the result payloads once emitted so the
+            AggregatedResult does not hold every host's output until the run ends.
+        on_record (callable): Called with every emitted record, e.g. to feed a live stream.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = RESULTS_LOG,
+        console: bool = True,
+        max_failures: int = 50,
+        max_result_chars: int = 4096,
+        release: bool = True,
+        on_record=None,
+    ):
+        self.path = Path(path) if path else None
+        self.console = console
+        self.max_result_chars = max_result_chars
+        self.release = release
+        self.on_record = on_record
+        self.counters = {}
+        self.failures = deque(maxlen=max_failures)
+        self._lock = threading.Lock()
+        self._file = None
+        self._started = {}
+
+    def _truncate(self, value) -> str | None:
+        if value is None:
+            return None
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        if len(text) > self.max_result_chars:
+            return text[:self.max_result_chars] + "...(truncated)"
+        return text
+
+    def _emit(self, record: dict) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            if self.path:
+                if self._file is None:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    self._file = open(self.path, "a", buffering=1)
+                self._file.write(line + "\n")
+            if self.console:
+                status = "FAILED" if record["failed"] else "CHANGED" if record["changed"] else "OK"
+                print(f"{record['timestamp']} {record['task']:<24} {record['host']:<16} {status} {record['elapsed']:.2f}s", flush=True)
+        if self.on_record:
+            self.on_record(record)
+
+    def _counters(self, name: str) -> dict:
+        return self.counters.setdefault(name, {"ok": 0, "failed": 0, "changed": 0, "elapsed": 0.0})
+
+    def task_started(self, task: Task) -> None:
+        self._started[id(task)] = time.monotonic()
+
+    def task_completed(self, task: Task, result: AggregatedResult) -> None:
+        started = self._started.pop(id(task), time.monotonic())
+        with self._lock:
+            self._counters(task.name)["elapsed"] += time.monotonic() - started
+            if self._file is not None:
+                self._file.flush()
+
+    def task_instance_started(self, task: Task, host: Host) -> None:
+        self._started[(task.name, host.name)] = time.monotonic()
+
+    def task_instance_completed(self, task: Task, host: Host, result: MultiResult) -> None:
+        started = self._started.pop((task.name, host.name), time.monotonic())
+        exception = next((r.exception for r in result if r.exception), None)
+        record = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "task": task.name,
+            "host": host.name,
+            "failed": result.failed,
+            "changed": result.changed,
+            "elapsed": round(time.monotonic() - started, 3),
+            "result": self._truncate(result[0].result if result else None),
+            "exception": str(exception) if exception else None,
+        }
+        metrics = getattr(result[0], "metrics", None) if result else None
+        if metrics:
+            record["metrics"] = metrics
+        self._emit(record)
+
+        with self._lock:
+            counters = self._counters(task.name)
+            counters["failed" if result.failed else "ok"] += 1
+            counters["changed"] += int(result.changed)
+            if result.failed:
+                self.failures.append(record)
+
+        if self.release:
+            for r in result:
+                r.result = None
+                r.diff = ""
+
+    def subtask_instance_started(self, task: Task, host: Host) -> None:
+        pass
+
+    def subtask_instance_completed(self, task: Task, host: Host, result: MultiResult) -> None:
+        pass
+
+    def summary(self) -> dict:
+        """
+        Returns the per-task counters and the most recent failures.
+        """
+        with self._lock:
+            return {"tasks": {k: dict(v) for k, v in self.counters.items()}, "failures": list(self.failures)}
+
+    def print_summary(self) -> None:
+        summary = self.summary()
+        for task, counters in summary["tasks"].items():
+            print(f"{task}: {counters['ok']} ok, {counters['failed']} failed, {counters['changed']} changed "
+                  f"in {counters['elapsed']:.1f}s")
+        for failure in summary["failures"]:
+            print(f"  FAILED {failure['task']} {failure['host']}: {failure['exception'] or failure['result']}")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+async def follow(path: Path = RESULTS_LOG, from_start: bool = False, poll_interval: float = 0.5):
+    """
+    Yields JSON records appended to a results file, like `tail -F`.
+
+    Yields None after every poll without a new record, so a consumer can send
+    a keep-alive or stop once its client is gone instead of waiting for the
+    next line. The file is reopened from its start when it is rotated (new
+    inode), truncated or recreated.
+
+    Args:
+        path (Path): The JSON-lines file.
+        from_start (bool): Also yield the records already in the file.
+        poll_interval (float): Seconds to wait when no new line is available.
+    """
+    path = Path(path)
+    f, inode, buffer, idle = None, None, "", None
+    try:
+        while True:
+            if f is None:
+                try:
+                    f = open(path, "r")
+                    inode = os.fstat(f.fileno()).st_ino
+                    if not from_start:
+                        f.seek(0, os.SEEK_END)
+                except FileNotFoundError:
+                    f = None
+                # Files created or rotated after the first open are read from their start
+                from_start = True
+                if f is None:
+                    yield None
+                    await asyncio.sleep(poll_interval)
+                    continue
+
+            chunk = f.readline()
+            if chunk:
+                buffer += chunk
+                if buffer.endswith("\n"):
+                    record, buffer = json.loads(buffer), ""
+                    yield record
+                continue
+
+            try:
+                stat = os.stat(path)
+                position = f.tell()
+                # Rewritten in place: modified since the last idle poll without new data to read
+                rewritten = idle is not None and idle[0] == position and idle[1] != stat.st_mtime_ns
+                rotated = stat.st_ino != inode or stat.st_size < position or rewritten
+                idle = (position, stat.st_mtime_ns)
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                f.close()
+                f, buffer, idle = None, "", None
+                continue
+            yield None
+            await asyncio.sleep(poll_interval)
+    finally:
+        if f is not None:
+            f.close()
@@ -0,0 +1,242 @@
+"""
+Sampling profiler for deploy and compliance runs.
+
+`SamplingProfiler` samples the stack of every thread with
+`sys._current_frames()` at a fixed interval from a background thread, so it
+sees the Nornir worker threads without instrumenting them. Each sample is
+tagged with the current run stage (`stage()`) and the thread name, and is
+put in the category (Jinja render, YAML parse, pynetbox, HTTP, gRPC...) of
+the innermost frame that belongs to a known module.
+
+`write_folded` writes the samples in the folded-stack format read by
+flamegraph.pl, speedscope and inferno:
+
+    deploy;render;ThreadPoolExecutor-0_3;src.nornir_tasks.deploy_config.render_template_json;... 42
+
+Samples are wall-clock: a thread waiting on the network is counted in the
+frame it waits in, which is where a slow run spends its time. Only threads
+whose whole stack is thread pool or Nornir runner plumbing (idle pool
+workers, the main thread waiting for the workers of `nr.run`) are skipped,
+so they do not dilute the hotspots; a task waiting on a lock, a condition or
+a future (e.g. `StateStore.wait_for`, gNMI channel setup) is still counted.
+The CPU time of every thread is read from its CPU clock at each sample and
+reported per stage and category next to the wall-clock samples.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+# Module prefix -> category of the time spent in it
+CATEGORIES = {
+    "jinja2": "jinja render",
+    "nornir_jinja2": "jinja render",
+    "yaml": "yaml parse",
+    "pynetbox": "pynetbox",
+    "requests": "http",
+    "urllib3": "http",
+    "http": "http",
+    "ssl": "http",
+    "grpc": "grpc",
+    "pygnmi": "grpc",
+    "json": "json",
+    "src": "project",
+    "nornir": "nornir",
+}
+
+# Modules of the thread and pool machinery a waiting thread is parked in
+PLUMBING_MODULES = ("threading.", "concurrent.futures.", "queue.")
+
+# Frames that only wait for other threads to do the work (the Nornir runner, bounded calls)
+RUNNER_MODULES = ("nornir.plugins.runners.", "src.nornir_tasks.resilience.run_with_timeout")
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__")
+    if module is None:
+        # Compiled Jinja templates run without a module name
+        module = f"jinja2.template[{Path(code.co_filename).name}]"
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def category(label: str) -> str:
+    module = label.split(".", 1)[0]
+    return CATEGORIES.get(module, "other")
+
+
+def stack_category(frames) -> str:
+    """
+    Returns the category of the innermost frame of a stack (outermost first) that has one.
+
+    Standard library leaves (socket reads, lock waits, regexes...) are charged
+    to the library that called them, e.g. a socket read under urllib3 is "http".
+    """
+    for label in reversed(frames):
+        name = category(label)
+        if name != "other":
+            return name
+    return "other"
+
+
+def is_idle(stack) -> bool:
+    """
+    Returns True if a stack (innermost first) is only thread pool or runner plumbing.
+
+    An idle pool worker has nothing but `threading` and `concurrent.futures`
+    frames, and the thread running `nr.run` waits in the runner for its
+    workers. A thread waiting below any other frame is doing work for that frame.
+    """
+    for label in stack:
+        if not label.startswith(PLUMBING_MODULES):
+            return label.startswith(RUNNER_MODULES)
+    return True
+
+
+def thread_cpu_time(ident: int) -> float | None:
+    """
+    Returns the CPU time in seconds consumed by a thread, or None if the platform cannot tell.
+    """
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads in the background.
+
+    Args:
+        name (str): Root frame of every sample, e.g. the script name.
+        interval (float): Seconds between two samples.
+        max_depth (int): Frames kept per sample, counted from the innermost one.
+    """
+
+    def __init__(self, name: str, interval: float = 0.01, max_depth: int = 64):
+        self.name = name
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.cpu = Counter()
+        self.current_stage = "startup"
+        self.started = None
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Tags the samples taken inside the block with the stage `name`.
+        """
+        previous, self.current_stage = self.current_stage, name
+        try:
+            yield
+        finally:
+            self.current_stage = previous
+
+    def start(self) -> None:
+        self._stop.clear()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.elapsed += time.perf_counter() - self.started
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        cpu_seen = {}
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stage = self.current_stage
+            frames = sys._current_frames()
+            cpu_seen = {ident: cpu_seen[ident] for ident in frames if ident in cpu_seen}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                cpu = thread_cpu_time(ident)
+                cpu_used = cpu - cpu_seen.get(ident, cpu) if cpu is not None else 0.0
+                if cpu is not None:
+                    cpu_seen[ident] = cpu
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                if is_idle(stack):
+                    continue
+                stack.reverse()
+                key = (stage, names.get(ident, str(ident))) + tuple(stack)
+                self.samples[key] += 1
+                self.cpu[key] += cpu_used
+
+    def write_folded(self, path: Path) -> Path:
+        """
+        Writes the samples as folded stacks, one "frame;frame;... count" line per unique stack.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(";".join((self.name,) + stack) + f" {count}\n")
+        return path
+
+    def hotspots(self, top: int = 15) -> dict:
+        """
+        Returns the sample counts and CPU seconds per stage and category and the
+        `top` functions by self and total samples.
+        """
+        stages, categories, own, total = Counter(), Counter(), Counter(), Counter()
+        cpu_stages, cpu_categories = Counter(), Counter()
+        for key, count in self.samples.items():
+            stage, _thread, *frames = key
+            stages[stage] += count
+            cpu_stages[stage] += self.cpu[key]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            categories[stack_category(frames)] += count
+            cpu_categories[stack_category(frames)] += self.cpu[key]
+            for label in set(frames):
+                total[label] += count
+        return {
+            "samples": sum(stages.values()),
+            "cpu": sum(cpu_stages.values()),
+            "stages": stages.most_common(),
+            "categories": categories.most_common(),
+            "self": own.most_common(top),
+            "total": total.most_common(top),
+            "cpu_stages": cpu_stages.most_common(),
+            "cpu_categories": cpu_categories.most_common(),
+        }
+
+    def print_summary(self, top: int = 15) -> None:
+        report = self.hotspots(top)
+        samples = max(report["samples"], 1)
+        print(f"Profile: {report['samples']} samples over {self.elapsed:.1f}s ({self.interval * 1000:.0f} ms interval)")
+        for title in ("stages", "categories", "self", "total"):
+            print(f"  by {title}:")
+            for label, count in report[title]:
+                print(f"    {count / samples * 100:5.1f}%  {label}")
+        print(f"  CPU: {report['cpu']:.2f}s across sampled threads")
+        for title in ("cpu_stages", "cpu_categories"):
+            print(f"  CPU by {title.removeprefix('cpu_')}:")
+            for label, seconds in report[title]:
+                print(f"    {seconds:7.2f}s  {label}")
+
+    def report(self, path: Path, top: int = 15) -> None:
+        """
+        Stops sampling, writes the folded stacks to `path` and prints the hotspot summary.
+        """
+        self.stop()
+        self.write_folded(path)
+        self.print_summary(top)
+        print(f"Folded stacks written to {path} (render with flamegraph.pl or speedscope)")
@@ -0,0 +1,81 @@
+"""
+Compact record types for the data gathered from NetBox.
+
+Gathered interfaces and BGP sessions live in `task.host.data` for the whole
+run. Slotted, frozen dataclasses avoid a per-instance `__dict__` and the
+repeated strings (tags, peer groups, policies, status) are interned, which
+keeps memory per host small on large inventories. Templates read them by
+attribute exactly like the dicts they replace.
+"""
+import sys
+from dataclasses import asdict, dataclass
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(slots=True, frozen=True)
+class IPAddress:
+    """
+    An interface address in CIDR notation, e.g. "10.0.0.0/31".
+    """
+    address: str
+
+    @property
+    def ip(self) -> str:
+        return self.address.split("/")[0]
+
+    @property
+    def prefix_length(self) -> int:
+        return int(self.address.split("/")[1])
+
+    def __str__(self) -> str:
+        return self.address
+
+
+@dataclass(slots=True, frozen=True)
+class Interface:
+    name: str
+    description: str
+    ip: IPAddress
+    enabled: bool
+    tags: tuple
+
+    @classmethod
+    def create(cls, name, description, ip, enabled, tags):
+        return cls(
+            _intern(name),
+            description,
+            IPAddress(ip),
+            enabled,
+            tuple(_intern(tag) for tag in tags),
+        )
+
+
+@dataclass(slots=True, frozen=True)
+class BgpSession:
+    local_asn: int
+    remote_asn: int
+    local_address: str
+    remote_address: str
+    status: str
+    description: str
+    peer_group: str | None
+    export_policy: str | None
+    import_policy: str | None
+
+    @classmethod
+    def create(cls, **fields):
+        return cls(**{name: _intern(value) for name, value in fields.items()})
+
+
+def as_dict(record) -> dict:
+    """
+    Returns a plain, JSON-serialisable dict of a record.
+    """
+    data = asdict(record)
+    if isinstance(record, Interface):
+        data["ip"] = record.ip.address
+        data["tags"] = list(record.tags)
+    return data
@@ -0,0 +1,229 @@
+"""
+Per-run deadlines and a per-device circuit breaker.
+
+A `Deadline` is created once per run and passed to the gather, render, push,
+verify and diff tasks. Every network call waits at most the smaller of its
+stage timeout and the time left in the run, and no stage starts once the run
+is out of time.
+
+`CircuitBreaker` keeps track of devices that stopped answering. After
+`threshold` consecutive failures confirmed by a TCP probe, the device's
+circuit opens: calls fail immediately with the cached error and the only
+work spent on the device is a probe every `probe_interval` seconds. The
+first successful probe closes the circuit again.
+"""
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import requests
+
+# Upper bound in seconds of a single call in each stage
+STAGE_TIMEOUTS = {
+    "gather": 30,     # NetBox API request
+    "push": 10,       # gNMI connection, then the Set
+    "verify": 90,     # wait for the expected state
+    "diff": 10,       # JSON-RPC request
+    "remediate": 60,  # FastAPI remediation POST
+}
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class DeviceUnreachable(Exception):
+    pass
+
+
+class Deadline:
+    """
+    Time budget of a run.
+
+    Args:
+        seconds (float): Budget from now. None means no run deadline, only the stage timeouts apply.
+    """
+
+    def __init__(self, seconds: float | None = None):
+        self.expires = time.monotonic() + seconds if seconds is not None else None
+
+    def remaining(self) -> float | None:
+        if self.expires is None:
+            return None
+        return self.expires - time.monotonic()
+
+    def check(self, stage: str) -> None:
+        """
+        Raises DeadlineExceeded if the run is out of time, for local stages (e.g. rendering) without a call to bound.
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"Run deadline exceeded before {stage}")
+
+    def timeout(self, stage: str) -> float:
+        """
+        Returns the timeout of the next call in `stage`, raising DeadlineExceeded if the run is out of time.
+        """
+        self.check(stage)
+        remaining = self.remaining()
+        cap = STAGE_TIMEOUTS[stage]
+        return cap if remaining is None else min(cap, remaining)
+
+
+# Default of the tasks when they run outside of a deadline-aware run
+NO_DEADLINE = Deadline()
+
+
+class TimeoutSession(requests.Session):
+    """
+    requests session applying a default timeout, for clients like pynetbox that do not set one.
+
+    `limit` overrides the timeout for the requests made by the current thread,
+    so each Nornir worker can bound its calls by the time left in its run.
+    """
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @contextmanager
+    def limit(self, timeout: float):
+        previous = getattr(self._local, "timeout", None)
+        self._local.timeout = timeout
+        try:
+            yield self
+        finally:
+            self._local.timeout = previous
+
+    def request(self, *args, **kwargs):
+        timeout = getattr(self._local, "timeout", None)
+        kwargs.setdefault("timeout", self.timeout if timeout is None else timeout)
+        return super().request(*args, **kwargs)
+
+
+def run_with_timeout(func, timeout: float, name: str = "bounded-call"):
+    """
+    Calls `func` in a daemon thread and waits at most `timeout` seconds for its result.
+
+    For blocking clients without a per-call timeout (e.g. pygnmi's Set). On
+    timeout the call keeps running in its thread: the caller should close
+    whatever it is blocked on (e.g. the gRPC channel) to release it.
+
+    Raises:
+        TimeoutError: If `func` did not return within `timeout` seconds.
+    """
+    future = Future()
+
+    def target():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name=name, daemon=True).start()
+    return future.result(timeout)
+
+
+@dataclass(slots=True)
+class CircuitState:
+    failures: int = 0
+    opened_at: float | None = None
+    last_probe: float = 0.0
+    error: str | None = None
+
+
+class CircuitBreaker:
+    """
+    Short-circuits calls to unreachable devices.
+
+    Args:
+        threshold (int): Consecutive failures before the device is probed and its circuit may open.
+        probe_interval (float): Minimum seconds between two probes of an open circuit.
+        probe_timeout (float): Timeout of the TCP reachability probe.
+        probe_port (int): Port probed when the host has no pygnmi port.
+    """
+
+    def __init__(self, threshold: int = 2, probe_interval: float = 30, probe_timeout: float = 1.0, probe_port: int = 57400):
+        self.threshold = threshold
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.probe_port = probe_port
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def probe(self, host) -> bool:
+        """
+        Returns True if the device accepts a TCP connection on its gNMI port.
+        """
+        port = host.get_connection_parameters("pygnmi").port or self.probe_port
+        try:
+            with socket.create_connection((host.hostname, port), timeout=self.probe_timeout):
+                return True
+        except OSError:
+            return False
+
+    def check(self, host) -> None:
+        """
+        Raises DeviceUnreachable with the cached error while the device's circuit is open.
+        """
+        with self._lock:
+            state = self._states.get(host.name)
+            if state is None or state.opened_at is None:
+                return
+            if time.monotonic() - state.last_probe < self.probe_interval:
+                raise DeviceUnreachable(f"{host.name} unreachable (circuit open): {state.error}")
+            state.last_probe = time.monotonic()
+
+        if not self.probe(host):
+            raise DeviceUnreachable(f"{host.name} still unreachable: {state.error}")
+        with self._lock:
+            state.opened_at = None
+            state.failures = 0
+
+    def success(self, host) -> None:
+        with self._lock:
+            self._states.pop(host.name, None)
+
+    def failure(self, host, error: Exception) -> None:
+        """
+        Records a failed call and opens the circuit if the device also fails the probe.
+        """
+        with self._lock:
+            state = self._states.setdefault(host.name, CircuitState())
+            state.failures += 1
+            state.error = str(error)
+            if state.failures < self.threshold or state.opened_at is not None:
+                return
+        if not self.probe(host):
+            with self._lock:
+                state.opened_at = state.last_probe = time.monotonic()
+
+    def call(self, host, func, *args, **kwargs):
+        """
+        Calls `func` unless the device's circuit is open, recording the outcome.
+        """
+        self.check(host)
+        try:
+            result = func(*args, **kwargs)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            self.failure(host, e)
+            raise
+        self.success(host)
+        return result
+
+    def open_circuits(self) -> dict:
+        """
+        Returns the cached error of every device whose circuit is open.
+        """
+        with self._lock:
+            return {name: s.error for name, s in self._states.items() if s.opened_at is not None}
+
+
+breaker = CircuitBreaker()
@@ -0,0 +1,142 @@
+"""
+Jittered, adaptive scheduling of per-device compliance checks.
+
+Instead of checking every device at once and sleeping, each device gets its
+own due time. Initial due times are spread evenly across the interval and
+every reschedule adds random jitter, so checks (and the Pushgateway/FastAPI
+calls they trigger) arrive at a flat rate. A device's interval shrinks
+towards `min_interval` when it drifts or was deployed recently and grows
+towards `max_interval` while it stays compliant.
+"""
+import heapq
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class DeviceSchedule:
+    name: str
+    next_due: float
+    interval: float
+    drift_score: float = 0.0
+    clean_streak: int = 0
+    last_checked: float | None = None
+
+
+class ComplianceScheduler:
+    """
+    Schedules compliance checks per device.
+
+    Args:
+        hosts: Names of the devices to check.
+        interval (float): Base check interval in seconds.
+        min_interval (float): Interval for drifting or recently deployed devices.
+        max_interval (float): Upper bound for devices that keep being compliant.
+        jitter (float): Relative random jitter applied to every interval.
+        backoff (float): Interval growth factor per consecutive clean check.
+        drift_weight (float): Weight of the latest check in the drift score (EMA).
+        recent_deploy (float): Devices deployed within this many seconds use `min_interval`.
+        last_deploy: Callable returning the epoch of a device's last deploy, or None.
+    """
+
+    def __init__(
+        self,
+        hosts,
+        interval: float = 30,
+        min_interval: float = 10,
+        max_interval: float = 300,
+        jitter: float = 0.2,
+        backoff: float = 1.5,
+        drift_weight: float = 0.5,
+        recent_deploy: float = 600,
+        last_deploy=None,
+    ):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.backoff = backoff
+        self.drift_weight = drift_weight
+        self.recent_deploy = recent_deploy
+        self.last_deploy = last_deploy
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+
+        hosts = list(hosts)
+        now = time.monotonic()
+        self.devices = {}
+        self._queue = []
+        for i, name in enumerate(hosts):
+            offset = (i + random.random()) * interval / max(len(hosts), 1)
+            device = DeviceSchedule(name=name, next_due=now + offset, interval=interval)
+            self.devices[name] = device
+            heapq.heappush(self._queue, (device.next_due, name))
+
+    def next_interval(self, device: DeviceSchedule) -> float:
+        """
+        Returns the next check interval of a device from its drift history and last deploy.
+        """
+        deployed = self.last_deploy(device.name) if self.last_deploy else None
+        if deployed is not None and time.time() - deployed < self.recent_deploy:
+            return self.min_interval
+        interval = min(self.max_interval, self.interval * self.backoff ** device.clean_streak)
+        return interval - (interval - self.min_interval) * device.drift_score
+
+    def record(self, name: str, drift: bool) -> None:
+        """
+        Records the outcome of a check and reschedules the device with jitter.
+        """
+        with self._cond:
+            device = self.devices[name]
+            device.last_checked = time.time()
+            device.drift_score = (1 - self.drift_weight) * device.drift_score + self.drift_weight * drift
+            device.clean_streak = 0 if drift else device.clean_streak + 1
+            device.interval = self.next_interval(device)
+            jitter = random.uniform(1 - self.jitter, 1 + self.jitter)
+            device.next_due = time.monotonic() + device.interval * jitter
+            heapq.heappush(self._queue, (device.next_due, name))
+            self._cond.notify_all()
+
+    def next_due(self) -> str | None:
+        """
+        Blocks until the next device is due and returns its name, or None once stopped.
+        """
+        with self._cond:
+            while not self._stop.is_set():
+                if self._queue:
+                    due, name = self._queue[0]
+                    wait = due - time.monotonic()
+                    if wait <= 0:
+                        heapq.heappop(self._queue)
+                        return name
+                else:
+                    wait = None
+                self._cond.wait(wait)
+        return None
+
+    def stop(self) -> None:
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    def run(self, check, workers: int = 10) -> None:
+        """
+        Runs checks as devices become due until `stop` is called.
+
+        Args:
+            check: Callable taking a device name and returning True if it drifted.
+            workers (int): Maximum number of concurrent checks.
+        """
+        def run_check(name):
+            try:
+                drift = check(name)
+            except Exception:
+                drift = True
+            self.record(name, drift)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while (name := self.next_due()) is not None:
+                pool.submit(run_check, name)
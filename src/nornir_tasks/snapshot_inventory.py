@@ -0,0 +1,432 @@
+"""
+Snapshot-backed Nornir inventory.
+
+`SnapshotInventory` loads hosts, groups, defaults and the data gathered from
+NetBox from a local snapshot file, so the API, the compliance loop and the
+deploy tool start in milliseconds and keep working when NetBox is slow or
+down. The snapshot is exported from NetBox with:
+
+    python -m src.nornir_tasks.snapshot_inventory --config config.yaml --enrich
+
+The file is memory-mapped. Loading decodes only the header; the data of a
+host is decoded from its blob the first time it is accessed. Values shared
+by several hosts (the fleet-wide config context, e.g. the iBGP neighbor
+list) are stored once in the header, addressed by the SHA-256 of their
+canonical JSON, and frozen once on load, so every host references the same
+read-only object as after a live gather.
+
+File layout (compact JSON):
+    line 1: magic "NRSNAP2"
+    line 2: header {"created", "defaults", "groups", "shared": {digest: value},
+                    "hosts": {host: {"hostname", ..., "groups", "connection_options", "data": [offset, length]}}}
+    rest:   one compact JSON object per host with its data, at the offsets of the header;
+            values shared with other hosts are {"$ref": digest}
+"""
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from collections import Counter
+from collections.abc import Mapping, MutableMapping
+from pathlib import Path
+
+from nornir import InitNornir
+from nornir.core.inventory import (
+    ConnectionOptions,
+    Defaults,
+    Group,
+    Groups,
+    Host,
+    Hosts,
+    Inventory,
+    ParentGroups,
+)
+from nornir.core.plugins.inventory import InventoryPluginRegister
+
+from src.nornir_tasks.context_cache import freeze, thaw
+from src.nornir_tasks.gather import ctx_store, get_ct_from_netbox, get_interfaces_from_netbox, get_ebgp_from_netbox
+from src.nornir_tasks.records import BgpSession, Interface, as_dict
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = Path("src/inventory/snapshot.nrsnap")
+MAGIC = b"NRSNAP2\n"
+
+# Host data derived at run time, never stored in the snapshot
+RUNTIME_KEYS = ("model",)
+
+# Per-host records, always stored in the host's own blob
+RECORD_KEYS = ("interfaces", "ebgp_sessions")
+
+_REF = "$ref"
+
+
+def _canonical(value) -> bytes:
+    return json.dumps(thaw(value), sort_keys=True, separators=(",", ":"), default=str).encode()
+
+
+def _dump_data(data, refs: dict | None = None) -> dict:
+    """
+    Returns a JSON-serialisable copy of host data. Values found in `refs`
+    (object id -> digest) are replaced by a reference to the shared copy.
+    """
+    dumped = {}
+    for key, value in data.items():
+        if key in RUNTIME_KEYS:
+            continue
+        if key in RECORD_KEYS:
+            dumped[key] = [as_dict(record) for record in value]
+        elif refs and id(value) in refs:
+            dumped[key] = {_REF: refs[id(value)]}
+        else:
+            dumped[key] = thaw(value)
+    return dumped
+
+
+def _load_data(data: dict, shared: dict | None = None) -> dict:
+    for key, value in data.items():
+        if isinstance(value, dict) and len(value) == 1 and _REF in value:
+            data[key] = shared[value[_REF]]
+    if "interfaces" in data:
+        data["interfaces"] = [Interface.create(**i) for i in data["interfaces"]]
+    if "ebgp_sessions" in data:
+        data["ebgp_sessions"] = [BgpSession.create(**s) for s in data["ebgp_sessions"]]
+    return data
+
+
+def _shared_values(hosts) -> tuple:
+    """
+    Finds the data values held by more than one host.
+
+    Returns:
+        tuple: The shared values by digest, and the digest of each shared object by object id.
+    """
+    digests, counts, values = {}, Counter(), {}
+    for host in hosts:
+        for key, value in host.data.items():
+            if key in RUNTIME_KEYS or key in RECORD_KEYS or not isinstance(value, (dict, list, tuple, Mapping)):
+                continue
+            # Interned values are the same object on every host: hash them once
+            digest = digests.get(id(value))
+            if digest is None:
+                digest = digests[id(value)] = hashlib.sha256(_canonical(value)).hexdigest()
+            counts[digest] += 1
+            values.setdefault(digest, value)
+    shared = {digest: thaw(values[digest]) for digest, count in counts.items() if count > 1}
+    refs = {oid: digest for oid, digest in digests.items() if digest in shared}
+    return shared, refs
+
+
+def _dump_connection_options(options: dict) -> dict:
+    return {
+        name: {
+            "hostname": o.hostname,
+            "port": o.port,
+            "username": o.username,
+            "password": o.password,
+            "platform": o.platform,
+            "extras": o.extras,
+        }
+        for name, o in options.items()
+    }
+
+
+def _load_connection_options(options: dict) -> dict:
+    return {name: ConnectionOptions(**o) for name, o in (options or {}).items()}
+
+
+def _dump_element(element, data: bool = True) -> dict:
+    entry = {
+        "hostname": element.hostname,
+        "port": element.port,
+        "username": element.username,
+        "password": element.password,
+        "platform": element.platform,
+        "groups": [g.name for g in getattr(element, "groups", [])],
+        "connection_options": _dump_connection_options(element.connection_options),
+    }
+    if data:
+        entry["data"] = _dump_data(element.data)
+    return entry
+
+
+def export_snapshot(inventory: Inventory, path: Path = SNAPSHOT_FILE) -> Path:
+    """
+    Writes a Nornir inventory, including the host data gathered so far, to a snapshot file.
+
+    The file is written to a temporary file unique to the writer and
+    atomically moved into place, so readers never see a partial snapshot.
+    """
+    shared, refs = _shared_values(inventory.hosts.values())
+    blobs, hosts, offset = [], {}, 0
+    for name, host in inventory.hosts.items():
+        blob = json.dumps(_dump_data(host.data, refs), separators=(",", ":"), default=str).encode()
+        hosts[name] = {**_dump_element(host, data=False), "data": [offset, len(blob)]}
+        blobs.append(blob)
+        offset += len(blob)
+
+    defaults = inventory.defaults
+    header = {
+        "created": time.time(),
+        "defaults": {
+            "hostname": defaults.hostname,
+            "port": defaults.port,
+            "username": defaults.username,
+            "password": defaults.password,
+            "platform": defaults.platform,
+            "data": _dump_data(defaults.data),
+            "connection_options": _dump_connection_options(defaults.connection_options),
+        },
+        "groups": {name: _dump_element(group) for name, group in inventory.groups.items()},
+        "shared": shared,
+        "hosts": hosts,
+    }
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(json.dumps(header, separators=(",", ":"), default=str).encode() + b"\n")
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+    return path
+
+
+class Snapshot:
+    """
+    A memory-mapped snapshot file.
+
+    The mapping stays valid after the file is replaced by a newer export, so
+    hosts loaded from it can still decode their data.
+
+    Attributes:
+        header (dict): The decoded header.
+        shared (dict): The shared values by digest, frozen.
+    """
+
+    def __init__(self, path: Path = SNAPSHOT_FILE):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an inventory snapshot")
+        header_end = self._map.find(b"\n", len(MAGIC))
+        self.header = json.loads(self._map[len(MAGIC):header_end])
+        self.shared = {digest: freeze(value) for digest, value in self.header["shared"].items()}
+        self._base = header_end + 1
+
+    def host_data(self, name: str) -> dict:
+        """
+        Decodes the data of a host from its blob.
+        """
+        offset, length = self.header["hosts"][name]["data"]
+        start = self._base + offset
+        return _load_data(json.loads(self._map[start:start + length]), self.shared)
+
+
+def read_snapshot(path: Path = SNAPSHOT_FILE) -> Snapshot:
+    """
+    Opens a snapshot file. Host data is decoded on demand with `Snapshot.host_data`.
+    """
+    return Snapshot(path)
+
+
+class LazyHostData(MutableMapping):
+    """
+    Host data decoded from the snapshot on first access.
+    """
+
+    def __init__(self, snapshot: Snapshot, name: str):
+        self._snapshot = snapshot
+        self._name = name
+        self._data = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+    def _load(self) -> dict:
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = self._snapshot.host_data(self._name)
+        return self._data
+
+    # Nornir replaces falsy data with {}: stay lazy
+    def __bool__(self) -> bool:
+        return True
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __setitem__(self, key, value):
+        self._load()[key] = value
+
+    def __delitem__(self, key):
+        del self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __repr__(self):
+        return repr(self._data) if self.loaded else f"<{self._name} data not loaded>"
+
+
+class SnapshotInventory:
+    """
+    Nornir inventory plugin reading a snapshot exported from NetBox.
+
+    Args:
+        snapshot_file (str): Path of the snapshot file.
+        refresh_interval (float): If set, re-export the snapshot from NetBox in a
+            background thread every `refresh_interval` seconds and update the
+            loaded inventory in place: existing hosts keep their open connections,
+            devices added to NetBox are added and devices removed are dropped.
+        refresh_config (str): Nornir config file (NetBox inventory) used by the refresh.
+    """
+
+    def __init__(
+        self,
+        snapshot_file: str = str(SNAPSHOT_FILE),
+        refresh_interval: float | None = None,
+        refresh_config: str = "config.yaml",
+    ):
+        self.snapshot_file = Path(snapshot_file)
+        self.refresh_interval = refresh_interval
+        self.refresh_config = refresh_config
+        self.inventory = None
+
+    def load(self) -> Inventory:
+        snapshot = read_snapshot(self.snapshot_file)
+        header = snapshot.header
+
+        d = header["defaults"]
+        defaults = Defaults(
+            hostname=d["hostname"],
+            port=d["port"],
+            username=d["username"],
+            password=d["password"],
+            platform=d["platform"],
+            data=_load_data(d["data"]),
+            connection_options=_load_connection_options(d["connection_options"]),
+        )
+
+        groups = Groups()
+        self._add_groups(groups, header["groups"], defaults)
+
+        hosts = Hosts()
+        for name, h in header["hosts"].items():
+            hosts[name] = self._host(snapshot, name, h, groups, defaults)
+
+        self.inventory = Inventory(hosts=hosts, groups=groups, defaults=defaults)
+        if self.refresh_interval:
+            threading.Thread(target=self._refresh_loop, name="snapshot-refresh", daemon=True).start()
+        return self.inventory
+
+    @staticmethod
+    def _element(cls, name: str, entry: dict, defaults: Defaults, data):
+        return cls(
+            name=name,
+            hostname=entry["hostname"],
+            username=entry["username"],
+            password=entry["password"],
+            port=entry["port"],
+            platform=entry["platform"],
+            data=data,
+            connection_options=_load_connection_options(entry["connection_options"]),
+            defaults=defaults,
+        )
+
+    def _add_groups(self, groups: Groups, entries: dict, defaults: Defaults) -> None:
+        added = [name for name in entries if name not in groups]
+        for name in added:
+            groups[name] = self._element(Group, name, entries[name], defaults, _load_data(entries[name]["data"]))
+        for name in added:
+            groups[name].groups = ParentGroups([groups[parent] for parent in entries[name]["groups"]])
+
+    def _host(self, snapshot: Snapshot, name: str, entry: dict, groups: Groups, defaults: Defaults) -> Host:
+        host = self._element(Host, name, entry, defaults, LazyHostData(snapshot, name))
+        host.groups = ParentGroups([groups[parent] for parent in entry["groups"]])
+        return host
+
+    def _refresh(self) -> None:
+        export(self.refresh_config, self.snapshot_file, enrich=True)
+        snapshot = read_snapshot(self.snapshot_file)
+        inventory = self.inventory
+        self._add_groups(inventory.groups, snapshot.header["groups"], inventory.defaults)
+
+        hosts = Hosts()
+        for name, entry in snapshot.header["hosts"].items():
+            host = inventory.hosts.get(name)
+            if host is None:
+                hosts[name] = self._host(snapshot, name, entry, inventory.groups, inventory.defaults)
+                continue
+            # Keep the Host object, and with it its open connections
+            data = LazyHostData(snapshot, name)
+            if isinstance(host.data, LazyHostData) and host.data.loaded:
+                for key in RUNTIME_KEYS:
+                    if key in host.data:
+                        data[key] = host.data[key]
+            host.hostname = entry["hostname"]
+            host.platform = entry["platform"]
+            host.data = data
+            hosts[name] = host
+
+        removed = inventory.hosts.keys() - hosts.keys()
+        # Swapped in one assignment so runs never see a half-updated host list
+        inventory.hosts = hosts
+        if removed:
+            logger.info("Inventory snapshot refresh dropped %s", ", ".join(sorted(removed)))
+
+    def _refresh_loop(self) -> None:
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self._refresh()
+            except Exception as e:
+                logger.warning("Inventory snapshot refresh failed, keeping the current one: %s", e)
+
+
+InventoryPluginRegister.register("SnapshotInventory", SnapshotInventory)
+
+
+def export(config_file: str = "config.yaml", output: Path = SNAPSHOT_FILE, enrich: bool = False) -> Path:
+    """
+    Loads the inventory from NetBox and exports it to a snapshot file.
+
+    Args:
+        config_file (str): Nornir config file using the NetBox inventory.
+        output (Path): Snapshot file to write.
+        enrich (bool): Also gather config contexts, interfaces and eBGP sessions from NetBox.
+    """
+    nr = InitNornir(config_file=config_file)
+    if enrich:
+        ctx_store.reset()
+        for task in (get_ct_from_netbox, get_interfaces_from_netbox, get_ebgp_from_netbox):
+            nr.run(task=task)
+    return export_snapshot(nr.inventory, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the NetBox inventory to a local snapshot")
+    parser.add_argument("--config", default="config.yaml", help="Nornir config file with the NetBox inventory")
+    parser.add_argument("--output", type=Path, default=SNAPSHOT_FILE)
+    parser.add_argument("--enrich", action="store_true", help="Include config contexts, interfaces and eBGP sessions")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path = export(args.config, args.output, args.enrich)
+    print(f"Snapshot written to {path} ({path.stat().st_size} bytes) in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+In-process operational state store fed by gNMI subscriptions.
+
+A background thread per device keeps a gNMI STREAM subscription open and
+applies every notification to an in-memory table indexed by device, table
+and key (interface name, network-instance name, (network-instance, peer)
+for BGP neighbors, (network-instance, instance, area, interface, router-id)
+for OSPF neighbors). Readers get the latest state with a dict lookup instead
+of issuing a gNMI Get, and can block on `StateStore.wait_for` until a
+condition holds.
+"""
+import logging
+import re
+import threading
+import time
+
+from pygnmi.client import gNMIclient
+
+logger = logging.getLogger(__name__)
+
+# ON_CHANGE paths kept in the state table.
+ON_CHANGE_PATHS = [
+    "/interface[name=*]/oper-state",
+    "/interface[name=*]/admin-state",
+    "/interface[name=*]/subinterface[index=*]/oper-state",
+    "/network-instance[name=*]/oper-state",
+    "/network-instance[name=*]/protocols/bgp/neighbor[peer-address=*]/session-state",
+    "/network-instance[name=*]/protocols/ospf/instance[name=*]/area[area-id=*]/interface[interface-name=*]/neighbor[router-id=*]/adjacency-state",
+]
+
+# SAMPLE paths kept in the state table, with their interval in seconds.
+SAMPLE_PATHS = {
+    "/network-instance[name=*]/protocols/bgp/neighbor[peer-address=*]/received-messages/total-updates": 10,
+}
+
+# Table name -> path element names whose keys form the row index.
+TABLES = {
+    "interfaces": ("interface",),
+    "subinterfaces": ("interface", "subinterface"),
+    "network_instances": ("network-instance",),
+    "bgp_neighbors": ("network-instance", "protocols", "bgp", "neighbor"),
+    "ospf_neighbors": ("network-instance", "protocols", "ospf", "instance", "area", "interface", "neighbor"),
+}
+
+_ELEM = re.compile(r"(?:[\w.-]+:)?([\w.-]+)((?:\[[^\]]*\])*)")
+_KEY = re.compile(r"\[([^=\]]+)=([^\]]*)\]")
+
+
+def parse_path(path: str) -> list:
+    """
+    Splits a gNMI path string into (name, keys) elements, ignoring slashes inside key values.
+
+    Example:
+        "interface[name=ethernet-1/1]/oper-state" -> [("interface", ("ethernet-1/1",)), ("oper-state", ())]
+    """
+    elems, depth, current = [], 0, ""
+    for char in path.strip("/"):
+        if char == "/" and depth == 0:
+            elems.append(current)
+            current = ""
+            continue
+        depth += {"[": 1, "]": -1}.get(char, 0)
+        current += char
+    elems.append(current)
+
+    parsed = []
+    for elem in filter(None, elems):
+        match = _ELEM.fullmatch(elem)
+        if match:
+            parsed.append((match.group(1), tuple(v for _, v in _KEY.findall(match.group(2)))))
+    return parsed
+
+
+def index_path(path: str):
+    """
+    Maps a gNMI path to its (table, key, leaf) location in the state table, or None if it is not tracked.
+    """
+    elems = parse_path(path)
+    names = tuple(name for name, _ in elems)
+    best = None
+    for table, pattern in TABLES.items():
+        if names[:len(pattern)] == pattern and (best is None or len(pattern) > len(TABLES[best])):
+            best = table
+    if best is None:
+        return None
+
+    size = len(TABLES[best])
+    keys = tuple(k for _, elem_keys in elems[:size] for k in elem_keys)
+    leaf = "/".join(name for name, _ in elems[size:])
+    return best, keys[0] if len(keys) == 1 else keys, leaf
+
+
+def _flatten(leaf: str, value) -> dict:
+    if isinstance(value, dict):
+        rows = {}
+        for k, v in value.items():
+            k = k.split(":", 1)[-1]
+            rows.update(_flatten(f"{leaf}/{k}" if leaf else k, v))
+        return rows
+    return {leaf: value}
+
+
+class StateStore:
+    """
+    Thread-safe operational state table: device -> table -> key -> {leaf: value}.
+    """
+
+    def __init__(self):
+        self._tables = {}
+        self._updated = {}
+        self._cond = threading.Condition()
+
+    def apply(self, device: str, path: str, value) -> None:
+        """
+        Applies a single update (or a delete when `value` is None) to the table.
+        """
+        location = index_path(path)
+        if location is None:
+            return
+        table, key, leaf = location
+        with self._cond:
+            rows = self._tables.setdefault(device, {}).setdefault(table, {})
+            if value is None:
+                if leaf:
+                    rows.get(key, {}).pop(leaf, None)
+                else:
+                    rows.pop(key, None)
+            else:
+                rows.setdefault(key, {}).update(_flatten(leaf, value))
+            self._updated[device] = time.time()
+            self._cond.notify_all()
+
+    def clear(self, device: str) -> None:
+        """
+        Drops every table of a device, e.g. when its subscription is lost and the state may be stale.
+        """
+        with self._cond:
+            self._tables.pop(device, None)
+            self._updated[device] = time.time()
+            self._cond.notify_all()
+
+    def get(self, device: str, table: str, key=None):
+        """
+        Returns a copy of a row, or of a whole table when `key` is None.
+        """
+        with self._cond:
+            rows = self._tables.get(device, {}).get(table, {})
+            if key is None:
+                return {k: dict(v) for k, v in rows.items()}
+            return dict(rows[key]) if key in rows else None
+
+    def leaf(self, device: str, table: str, key, leaf: str):
+        """
+        Returns a single leaf value, or None if it has not been received.
+        """
+        with self._cond:
+            return self._tables.get(device, {}).get(table, {}).get(key, {}).get(leaf)
+
+    def snapshot(self, device: str) -> dict:
+        """
+        Returns a JSON-serialisable copy of every table for a device.
+        """
+        with self._cond:
+            return {
+                table: {"|".join(k) if isinstance(k, tuple) else k: dict(v) for k, v in rows.items()}
+                for table, rows in self._tables.get(device, {}).items()
+            }
+
+    def last_update(self, device: str) -> float | None:
+        return self._updated.get(device)
+
+    def wait_for(self, predicate, timeout: float) -> bool:
+        """
+        Blocks until `predicate(store)` is true or `timeout` seconds elapse.
+
+        The predicate is re-evaluated on every update, so it returns as soon
+        as the state converges instead of after a fixed polling interval.
+
+        Returns:
+            bool: True if the predicate was met before the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not predicate(self):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+
+class StateSubscriber:
+    """
+    Runs one gNMI STREAM subscription per device and feeds the notifications into a `StateStore`.
+
+    Args:
+        store (StateStore): The table to update.
+        paths (list): ON_CHANGE paths to subscribe to.
+        sample_paths (dict): SAMPLE paths with their interval in seconds.
+    """
+
+    def __init__(self, store: StateStore, paths: list = ON_CHANGE_PATHS, sample_paths: dict = SAMPLE_PATHS):
+        self.store = store
+        self.paths = list(paths)
+        self.sample_paths = dict(sample_paths)
+        self._threads = {}
+        self._clients = {}
+        self._synced = {}
+        self._stop = threading.Event()
+
+    def _subscription(self) -> dict:
+        subscription = [{"path": path, "mode": "on_change"} for path in self.paths]
+        subscription += [
+            {"path": path, "mode": "sample", "sample_interval": interval * 1_000_000_000}
+            for path, interval in self.sample_paths.items()
+        ]
+        return {"subscription": subscription, "mode": "stream", "encoding": "json_ietf"}
+
+    def start(self, hosts) -> None:
+        """
+        Starts a subscription thread for every Nornir host not already subscribed.
+        """
+        self._stop.clear()
+        for host in hosts:
+            if host.name in self._threads and self._threads[host.name].is_alive():
+                continue
+            self._synced[host.name] = threading.Event()
+            thread = threading.Thread(target=self._run, args=(host,), name=f"gnmi-sub-{host.name}", daemon=True)
+            self._threads[host.name] = thread
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        for client in list(self._clients.values()):
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def wait_synced(self, device: str, timeout: float) -> bool:
+        """
+        Waits for the initial sync_response of a device's subscription.
+        """
+        synced = self._synced.get(device)
+        return synced.wait(timeout) if synced else False
+
+    def _run(self, host) -> None:
+        # Same connection parameters as the push (nornir_pygnmi), so TLS settings apply to both
+        params = host.get_connection_parameters("pygnmi")
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                with gNMIclient(
+                    target=(params.hostname, params.port),
+                    username=params.username,
+                    password=params.password,
+                    **(params.extras or {}),
+                ) as client:
+                    self._clients[host.name] = client
+                    backoff = 1
+                    for message in client.subscribe2(subscribe=self._subscription()):
+                        if self._stop.is_set():
+                            break
+                        self._handle(host.name, message)
+            except Exception as e:
+                logger.warning("gNMI subscription to %s failed: %s", host.name, e)
+            finally:
+                self._clients.pop(host.name, None)
+                # Updates and deletes were missed while disconnected: drop the rows
+                # until the next subscription re-syncs them
+                self._synced[host.name].clear()
+                self.store.clear(host.name)
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _handle(self, device: str, message: dict | None) -> None:
+        if message is None:
+            # telemetryParser returns None for a message it could not parse
+            logger.debug("Skipping unparsable gNMI notification from %s", device)
+            return
+        if message.get("sync_response"):
+            self._synced[device].set()
+            return
+        notification = message.get("update", {})
+        prefix = notification.get("prefix", "")
+        for update in notification.get("update", []):
+            self.store.apply(device, f"{prefix}/{update['path']}", update.get("val"))
+        for delete in notification.get("delete", []):
+            # pygnmi's telemetryParser returns deletes as {"path": ...}
+            path = delete["path"] if isinstance(delete, dict) else delete
+            self.store.apply(device, f"{prefix}/{path}", None)
+
+
+# Process-wide state table and subscription service
+state_store = StateStore()
+state_subscriber = StateSubscriber(state_store)
@@ -0,0 +1,208 @@
+"""
+Offline validation of rendered configs against a compiled SR Linux model subset.
+
+`src/schema/srlinux.yaml` describes the part of the SR Linux YANG model the
+templates emit. It is compiled once into a tree of schema nodes, cached in
+memory and pickled next to the schema (keyed by the schema's hash), so a
+rendered tree is checked for unknown nodes, missing keys/mandatory leaves,
+type errors and dangling references in milliseconds, before any gNMI call.
+"""
+import hashlib
+import ipaddress
+import pickle
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import yaml
+
+SCHEMA_FILE = Path(__file__).resolve().parents[1] / "schema" / "srlinux.yaml"
+CACHE_FILE = SCHEMA_FILE.with_suffix(".compiled.pickle")
+
+_DOMAIN = re.compile(r"^(?=.{1,253}$)([A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)*[A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?$")
+_INTERFACE = re.compile(r"^(ethernet-\d+/\d+|lo\d+|mgmt0|irb\d+|system0)$")
+_SUBINTERFACE = re.compile(r"^(ethernet-\d+/\d+|lo\d+|mgmt0|irb\d+|system0)\.\d+$")
+
+
+def _is_ip(value, version=None, kind=ipaddress.ip_address) -> bool:
+    try:
+        address = kind(value)
+    except ValueError:
+        return False
+    return version is None or address.version == version
+
+
+def _is_uint(value, bits: int) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    return isinstance(value, int) and 0 <= value < 2 ** bits
+
+
+TYPE_CHECKS = {
+    "string": lambda v: isinstance(v, str),
+    "scalar": lambda v: isinstance(v, (str, int)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "uint16": lambda v: _is_uint(v, 16),
+    "uint32": lambda v: _is_uint(v, 32),
+    "ip-address": lambda v: isinstance(v, str) and _is_ip(v),
+    "ipv4-address": lambda v: isinstance(v, str) and _is_ip(v, 4),
+    "ipv4-prefix": lambda v: isinstance(v, str) and "/" in v and _is_ip(v, 4, ipaddress.ip_interface),
+    "dotted-quad": lambda v: isinstance(v, str) and _is_ip(v, 4),
+    "host": lambda v: isinstance(v, str) and (_is_ip(v) or bool(_DOMAIN.match(v))),
+    "interface-name": lambda v: isinstance(v, str) and bool(_INTERFACE.match(v)),
+    "subinterface-name": lambda v: isinstance(v, str) and bool(_SUBINTERFACE.match(v)),
+}
+
+
+class Node:
+    """
+    A compiled schema node.
+    """
+    __slots__ = ("kind", "children", "key", "type", "values", "mandatory", "collect", "collect_format", "ref")
+
+    def __init__(self, kind, children=None, key=None, type=None, values=None, mandatory=False,
+                 collect=None, collect_format=None, ref=None):
+        self.kind = kind
+        self.children = children
+        self.key = key
+        self.type = type
+        self.values = frozenset(values) if values else None
+        self.mandatory = mandatory
+        self.collect = collect
+        self.collect_format = collect_format
+        self.ref = ref
+
+
+def compile_schema(spec: dict) -> dict:
+    """
+    Compiles the YAML schema description into `Node` objects.
+
+    Raises:
+        ValueError: If a node has an unknown kind or type.
+    """
+    compiled = {}
+    for name, node in spec.items():
+        kind = node["kind"]
+        if kind in ("container", "list"):
+            compiled[name] = Node(kind, children=compile_schema(node["children"]), key=node.get("key"))
+            continue
+        if kind not in ("leaf", "leaf-list") or (node["type"] != "enum" and node["type"] not in TYPE_CHECKS):
+            raise ValueError(f"Invalid schema node {name}: {node}")
+        compiled[name] = Node(
+            kind,
+            type=node["type"],
+            values=node.get("values"),
+            mandatory=node.get("mandatory", False),
+            collect=node.get("collect"),
+            collect_format=node.get("collect_format"),
+            ref=node.get("ref"),
+        )
+    return compiled
+
+
+@lru_cache(maxsize=1)
+def load_schema(schema_file: Path = SCHEMA_FILE, cache_file: Path = CACHE_FILE) -> dict:
+    """
+    Returns the compiled schema, from the pickle cache when it matches the schema file.
+    """
+    source = schema_file.read_bytes()
+    digest = hashlib.sha256(source).hexdigest()
+    try:
+        with open(cache_file, "rb") as f:
+            cached_digest, compiled = pickle.load(f)
+        if cached_digest == digest:
+            return compiled
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        pass
+
+    compiled = compile_schema(yaml.safe_load(source))
+    try:
+        with open(cache_file, "wb") as f:
+            pickle.dump((digest, compiled), f)
+    except OSError:
+        pass
+    return compiled
+
+
+class _Validation:
+    def __init__(self):
+        self.errors = []
+        self.collected = {}
+        self.refs = []
+
+    def container(self, children: dict, value, path: str, keys: tuple) -> None:
+        if not isinstance(value, dict):
+            self.errors.append(f"{path or '/'}: expected a container, got {type(value).__name__}")
+            return
+        for name, child in value.items():
+            node = children.get(name)
+            if node is None:
+                self.errors.append(f"{path}/{name}: unknown node")
+            else:
+                self.node(node, child, f"{path}/{name}", keys)
+        for name, node in children.items():
+            if node.mandatory and name not in value:
+                self.errors.append(f"{path}/{name}: mandatory leaf missing")
+
+    def node(self, node: Node, value, path: str, keys: tuple) -> None:
+        if node.kind == "container":
+            self.container(node.children, value, path, keys)
+        elif node.kind == "list":
+            # SR Linux accepts a single entry given as an object (e.g. logging facility)
+            if isinstance(value, dict):
+                value = [value]
+            if not isinstance(value, list):
+                self.errors.append(f"{path}: expected a list, got {type(value).__name__}")
+                return
+            seen = set()
+            for entry in value:
+                key = entry.get(node.key) if isinstance(entry, dict) else None
+                if key is None:
+                    self.errors.append(f"{path}: entry without key '{node.key}'")
+                    continue
+                if key in seen:
+                    self.errors.append(f"{path}[{node.key}={key}]: duplicate entry")
+                seen.add(key)
+                self.container(node.children, entry, f"{path}[{node.key}={key}]", keys + (key,))
+        elif node.kind == "leaf-list":
+            if not isinstance(value, list):
+                self.errors.append(f"{path}: expected a leaf-list, got {type(value).__name__}")
+                return
+            for item in value:
+                self.leaf(node, item, path, keys)
+        else:
+            self.leaf(node, value, path, keys)
+
+    def leaf(self, node: Node, value, path: str, keys: tuple) -> None:
+        if node.type == "enum":
+            valid = value in node.values
+        else:
+            valid = TYPE_CHECKS[node.type](value)
+        if not valid:
+            self.errors.append(f"{path}: invalid {node.type} value {value!r}")
+            return
+        if node.collect:
+            name = node.collect_format.format(*keys) if node.collect_format else str(value)
+            self.collected.setdefault(node.collect, set()).add(name)
+        if node.ref:
+            self.refs.append((node.ref, str(value), path))
+
+
+def validate_tree(tree: dict) -> list:
+    """
+    Validates a rendered configuration tree against the compiled SR Linux model subset.
+
+    Args:
+        tree (dict): The parsed rendered configuration.
+
+    Returns:
+        list: Error messages as "<path>: <problem>"; empty when the tree is valid.
+    """
+    validation = _Validation()
+    validation.container(load_schema(), tree, "", ())
+    for ref, value, path in validation.refs:
+        if value not in validation.collected.get(ref, ()):
+            validation.errors.append(f"{path}: '{value}' does not reference an existing {ref} entry")
+    return validation.errors
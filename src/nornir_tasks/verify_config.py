@@ -0,0 +1,119 @@
+"""
+Post-push verification driven by gNMI subscriptions.
+
+Expected operational state (subinterfaces up, OSPF adjacencies full, BGP
+sessions established) is derived from the rendered config, and the task
+waits on the subscription-fed `state_store` until every expectation is met
+or the deadline expires, instead of sleeping and polling each device.
+"""
+import json
+import time
+from typing import NamedTuple
+
+from nornir.core.task import Task, Result
+from src.nornir_tasks.resilience import Deadline, NO_DEADLINE
+from src.nornir_tasks.state_store import state_store, state_subscriber
+
+
+class Expectation(NamedTuple):
+    """
+    A leaf value expected in the state table. With `prefix` set, any row whose
+    key starts with `key` satisfies it (e.g. any neighbor on an OSPF interface).
+    """
+    table: str
+    key: object
+    leaf: str
+    value: str
+    description: str
+    prefix: bool = False
+
+    def met(self, store, device: str) -> bool:
+        if not self.prefix:
+            return store.leaf(device, self.table, self.key, self.leaf) == self.value
+        size = len(self.key)
+        return any(
+            key[:size] == self.key and row.get(self.leaf) == self.value
+            for key, row in store.get(device, self.table).items()
+        )
+
+
+def expectations_from_config(config: dict) -> list:
+    """
+    Derives the operational state implied by a rendered SR Linux config.
+
+    Args:
+        config (dict): The rendered configuration tree.
+
+    Returns:
+        list: The `Expectation` objects for the device.
+    """
+    expectations = []
+    for iface in config.get("interface", []):
+        for sub in iface.get("subinterface", []):
+            if sub.get("admin-state", "enable") == "enable":
+                expectations.append(Expectation(
+                    "subinterfaces", (iface["name"], str(sub["index"])), "oper-state", "up",
+                    f"{iface['name']}.{sub['index']} up",
+                ))
+
+    for ni in config.get("network-instance", []):
+        protocols = ni.get("protocols", {})
+        for instance in protocols.get("ospf", {}).get("instance", []):
+            for area in instance.get("area", []):
+                for iface in area.get("interface", []):
+                    if iface.get("passive"):
+                        continue
+                    expectations.append(Expectation(
+                        "ospf_neighbors",
+                        (ni["name"], instance["name"], area["area-id"], iface["interface-name"]),
+                        "adjacency-state", "full",
+                        f"OSPF adjacency on {iface['interface-name']} full", prefix=True,
+                    ))
+
+        for neighbor in protocols.get("bgp", {}).get("neighbor", []):
+            afi_safi = neighbor.get("afi-safi", [])
+            if afi_safi and all(a.get("admin-state") == "disable" for a in afi_safi):
+                continue
+            expectations.append(Expectation(
+                "bgp_neighbors", (ni["name"], neighbor["peer-address"]), "session-state", "established",
+                f"BGP {neighbor['peer-address']} ({neighbor.get('description')}) established",
+            ))
+    return expectations
+
+
+def verify_config(task: Task, deadline: Deadline = NO_DEADLINE) -> Result:
+    """
+    Verifies that the device reached the operational state implied by its rendered config.
+
+    Completes as soon as every expectation is met and fails with the list of
+    unmet expectations once the verify stage timeout, capped by the time left
+    in the run, has elapsed. A run already out of time fails the host.
+
+    Args:
+        task (Task): The task to be executed.
+        deadline (Deadline): The run's time budget.
+
+    Returns:
+        Result: A result object with the verification outcome.
+    """
+    timeout = deadline.timeout("verify")
+    expires = time.monotonic() + timeout
+    with open(f"src/rendered_config/{task.host.name}.json", "r") as f:
+        expectations = expectations_from_config(json.load(f))
+
+    state_subscriber.start([task.host])
+    state_subscriber.wait_synced(task.host.name, max(expires - time.monotonic(), 0))
+    state_store.wait_for(
+        lambda store: all(e.met(store, task.host.name) for e in expectations),
+        max(expires - time.monotonic(), 0),
+    )
+
+    elapsed = timeout - max(expires - time.monotonic(), 0)
+    unmet = [e.description for e in expectations if not e.met(state_store, task.host.name)]
+    if unmet:
+        return Result(
+            host=task.host,
+            result=f"{len(unmet)}/{len(expectations)} expectations not met after {elapsed:.1f}s:\n" + "\n".join(unmet),
+            failed=True,
+        )
+    return Result(host=task.host, result=f"{len(expectations)} expectations met in {elapsed:.1f}s")